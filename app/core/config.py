@@ -1,5 +1,63 @@
 import os
 
-DB_PATH = "data/measurements.db"
+DB_PATH = os.environ.get("DB_PATH", "data/measurements.db")
 DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 SESSION_SECRET = os.environ.get("SESSION_SECRET", "dev-secret")
+
+# SQLite connection profile, applied to every pooled connection.
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB
+SQLITE_TEMP_STORE = os.environ.get("SQLITE_TEMP_STORE", "MEMORY")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MAINTENANCE_INTERVAL = int(os.environ.get("SQLITE_MAINTENANCE_INTERVAL", "3600"))
+
+# SQL profiler (app/core/profiler.py): per-request statement log and N+1 warnings
+# when SQL_PROFILE is on; statements slower than SQL_SLOW_MS are logged.
+SQL_PROFILE = os.environ.get("SQL_PROFILE", "0").lower() in ("1", "true", "yes", "on")
+SQL_SLOW_MS = float(os.environ.get("SQL_SLOW_MS", "100"))
+SQL_N_PLUS_ONE = int(os.environ.get("SQL_N_PLUS_ONE", "5"))
+
+MEASUREMENT_CACHE_MAX_BYTES = int(os.environ.get("MEASUREMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PLOT_CACHE_MAX_BYTES = int(os.environ.get("PLOT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SUGGEST_CACHE_MAX_BYTES = int(os.environ.get("SUGGEST_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Plot rendering: PLOT_WORKERS=0 renders in-process (tests, tiny deployments).
+PLOT_WORKERS = int(os.environ.get("PLOT_WORKERS", "2"))
+PLOT_MAX_PENDING = int(os.environ.get("PLOT_MAX_PENDING", "16"))
+PLOT_TIMEOUT = float(os.environ.get("PLOT_TIMEOUT", "30"))
+
+# Rows per page of /history (measurements) and saved days per page of /meals/history.
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "100"))
+MEALS_HISTORY_PAGE_SIZE = int(os.environ.get("MEALS_HISTORY_PAGE_SIZE", "30"))
+
+# "server" embeds rendered PNGs; "client" draws charts in the browser from /api/series.
+CHART_MODE = os.environ.get("CHART_MODE", "server")
+
+# Upstream services (overridable, e.g. to point tests at a local stand-in).
+OPENFOODFACTS_SEARCH_URL = os.environ.get("OPENFOODFACTS_SEARCH_URL", "https://world.openfoodfacts.org/cgi/search.pl")
+DUCKDUCKGO_HTML_URL = os.environ.get("DUCKDUCKGO_HTML_URL", "https://duckduckgo.com/html/")
+
+# Nutrition lookup cache (seconds). Entries past their TTL are still served for
+# KCAL_CACHE_STALE more seconds while a background refresh runs.
+KCAL_CACHE_TTL = int(os.environ.get("KCAL_CACHE_TTL", str(7 * 24 * 3600)))
+KCAL_CACHE_NEGATIVE_TTL = int(os.environ.get("KCAL_CACHE_NEGATIVE_TTL", str(6 * 3600)))
+KCAL_CACHE_STALE = int(os.environ.get("KCAL_CACHE_STALE", str(30 * 24 * 3600)))
+KCAL_CACHE_MAX_ENTRIES = int(os.environ.get("KCAL_CACHE_MAX_ENTRIES", "5000"))
+
+# Outbound HTTP: shared worker pool, connections per upstream host, and the
+# overall time budgets of one /kcal and one /recipes lookup (seconds).
+HTTP_WORKERS = int(os.environ.get("HTTP_WORKERS", "16"))
+HTTP_PER_HOST = int(os.environ.get("HTTP_PER_HOST", "4"))
+KCAL_DEADLINE = float(os.environ.get("KCAL_DEADLINE", "12"))
+RECIPES_DEADLINE = float(os.environ.get("RECIPES_DEADLINE", "20"))
+
+# Look products up in the local food table (see app/services/food_db.py) before going online.
+KCAL_LOCAL_FIRST = os.environ.get("KCAL_LOCAL_FIRST", "1").lower() in ("1", "true", "yes", "on")
+
+# /tips is served from a pool harvested in the background every TIPS_REFRESH_INTERVAL
+# seconds (0 disables harvesting); the pool keeps the newest TIPS_POOL_MAX tips.
+TIPS_REFRESH_INTERVAL = int(os.environ.get("TIPS_REFRESH_INTERVAL", str(6 * 3600)))
+TIPS_POOL_MAX = int(os.environ.get("TIPS_POOL_MAX", "500"))
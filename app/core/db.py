@@ -1,20 +1,241 @@
 import os
+import asyncio
+import logging
+import unicodedata
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine
 from app import models
-from .config import DATABASE_URL
+from app.core.metrics import instrument_engine
+from app.core.profiler import profile_engine
+from .config import (
+    DB_PATH,
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE,
+    SQLITE_TEMP_STORE,
+    SQLITE_BUSY_TIMEOUT_MS,
+)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+logger = logging.getLogger(__name__)
 
-if not os.path.exists("data"):
-    os.makedirs("data")
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+)
 
-SQLModel.metadata.create_all(engine)
+# Same database for async routes; aiosqlite runs each connection on its own thread.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+profile_engine(engine)
+profile_engine(async_engine.sync_engine)
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _apply_sqlite_pragmas(dbapi_conn, connection_record):
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cur.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cur.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    finally:
+        cur.close()
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_sqlite_functions(dbapi_conn, connection_record):
+    # SQLite's lower() only folds ASCII; meal names are mostly Polish.
+    dbapi_conn.create_function("py_lower", 1, lambda s: s.lower() if s is not None else None, deterministic=True)
+    # py_fold is for the app's own SQL (migrations); triggers must not call it, other clients lack it.
+    dbapi_conn.create_function("py_fold", 1, lambda s: fold_text(s) if s is not None else None, deterministic=True)
+
+def fold_text(s: str) -> str:
+    """Lower-case and strip diacritics, so "Jabłko" and "jablko" compare equal."""
+    s = unicodedata.normalize("NFKD", s.lower().replace("ł", "l"))
+    return "".join(c for c in s if not unicodedata.combining(c))
+
+def _migrate_user_columns(conn):
+    cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('measurement')").fetchall()]
+    if "user_id" not in cols:
+        conn.exec_driver_sql("ALTER TABLE measurement ADD COLUMN user_id INTEGER")
+    ucols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('user')").fetchall()]
+    if "daily_kcal_goal" not in ucols:
+        conn.exec_driver_sql("ALTER TABLE user ADD COLUMN daily_kcal_goal INTEGER DEFAULT 2000")
+
+def _migrate_user_date_indexes(conn):
+    # Older databases may hold several SavedDay rows per day; keep the newest one.
+    conn.exec_driver_sql(
+        "DELETE FROM savedday WHERE id NOT IN (SELECT MAX(id) FROM savedday GROUP BY user_id, date)"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_measurement_user_date ON measurement (user_id, date)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_meal_user_date ON meal (user_id, date)")
+    conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ux_savedday_user_date ON savedday (user_id, date)")
+    conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ux_user_email ON user (email)")
+    conn.exec_driver_sql("ANALYZE")
+
+def _migrate_food_search(conn):
+    # Trigram FTS5 (SQLite >= 3.34) over folded food names; _migrate_food_search_folded adds the triggers.
+    try:
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE IF NOT EXISTS food_fts USING fts5(text, tokenize='trigram')")
+    except exc.OperationalError as e:
+        raise RuntimeError(f"Local food search needs SQLite >= 3.34 with FTS5: {e}") from e
+
+def _migrate_food_search_folded(conn):
+    # The first version of these triggers called py_fold, so writes from any connection
+    # without that function (the sqlite3 CLI, other tools) failed. The importer now stores
+    # folded copies of the names and the triggers only concatenate them.
+    _migrate_food_search(conn)
+    cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('food')").fetchall()]
+    for col in ("name_pl_folded", "name_en_folded", "brands_folded"):
+        if col not in cols:
+            conn.exec_driver_sql(f"ALTER TABLE food ADD COLUMN {col} VARCHAR")
+    for trigger in ("food_ai", "food_ad", "food_au"):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.exec_driver_sql(
+        "UPDATE food SET name_pl_folded = py_fold(name_pl), name_en_folded = py_fold(name_en), "
+        "brands_folded = py_fold(brands)"
+    )
+    text = (
+        "coalesce({t}.name_pl_folded, '') || ' ' || coalesce({t}.name_en_folded, '') "
+        "|| ' ' || coalesce({t}.brands_folded, '')"
+    )
+    conn.exec_driver_sql("DELETE FROM food_fts")
+    conn.exec_driver_sql(f"INSERT INTO food_fts(rowid, text) SELECT id, {text.format(t='food')} FROM food")
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER food_ai AFTER INSERT ON food BEGIN "
+        f"INSERT INTO food_fts(rowid, text) VALUES (new.id, {text.format(t='new')}); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER food_ad AFTER DELETE ON food BEGIN "
+        "DELETE FROM food_fts WHERE rowid = old.id; END"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER food_au AFTER UPDATE ON food BEGIN "
+        f"DELETE FROM food_fts WHERE rowid = old.id; "
+        f"INSERT INTO food_fts(rowid, text) VALUES (new.id, {text.format(t='new')}); END"
+    )
+
+def rebuild_nutrition_rollups(conn):
+    """Recompute every user's day/week/month rollups and saved-day totals from the meal table.
+
+    Past goals aren't recorded, so every day gets the user's current one.
+    """
+    conn.exec_driver_sql(
+        "INSERT OR REPLACE INTO dailynutrition (user_id, date, total_kcal, meal_count, goal_kcal, delta_kcal) "
+        "SELECT m.user_id, m.date, sum(m.kcal), count(*), coalesce(u.daily_kcal_goal, 2000), "
+        "sum(m.kcal) - coalesce(u.daily_kcal_goal, 2000) "
+        "FROM meal m LEFT JOIN user u ON u.id = m.user_id WHERE m.user_id IS NOT NULL GROUP BY m.user_id, m.date"
+    )
+    starts = {
+        "week": "date(date, printf('-%d days', (strftime('%w', date) + 6) % 7))",
+        "month": "date(date, 'start of month')",
+    }
+    for period, start in starts.items():
+        conn.exec_driver_sql(
+            "INSERT OR REPLACE INTO periodnutrition (user_id, period, start, total_kcal, meal_count, days, goal_kcal, delta_kcal) "
+            f"SELECT user_id, '{period}', {start} AS s, sum(total_kcal), sum(meal_count), count(*), sum(goal_kcal), "
+            "sum(total_kcal) - sum(goal_kcal) FROM dailynutrition GROUP BY user_id, s"
+        )
+    conn.exec_driver_sql(
+        "UPDATE savedday SET total_kcal = coalesce((SELECT d.total_kcal FROM dailynutrition d "
+        "WHERE d.user_id = savedday.user_id AND d.date = savedday.date), 0)"
+    )
+
+def _migrate_nutrition_rollups(conn):
+    # Backfill the rollups that meal writes maintain from now on.
+    rebuild_nutrition_rollups(conn)
+
+def rebuild_user_totals(conn):
+    """Recount every user's measurements and saved days into usertotals."""
+    conn.exec_driver_sql("DELETE FROM usertotals")
+    conn.exec_driver_sql(
+        "INSERT INTO usertotals (user_id, measurements, saved_days) "
+        "SELECT user_id, sum(m), sum(s) FROM ("
+        "SELECT user_id, count(*) AS m, 0 AS s FROM measurement GROUP BY user_id UNION ALL "
+        "SELECT user_id, 0, count(*) FROM savedday GROUP BY user_id"
+        ") WHERE user_id IS NOT NULL GROUP BY user_id"
+    )
+
+def _migrate_user_totals(conn):
+    # Plain SQL triggers, so every writer (routes, CSV import, scripts, the sqlite3 CLI) keeps the counts.
+    # The counts are NOT NULL without a server default, so a user's first row sets both columns.
+    for table, column, ones in (("measurement", "measurements", "1, 0"), ("savedday", "saved_days", "0, 1")):
+        add = (
+            f"INSERT INTO usertotals (user_id, measurements, saved_days) VALUES (new.user_id, {ones}) "
+            f"ON CONFLICT(user_id) DO UPDATE SET {column} = {column} + 1"
+        )
+        remove = f"UPDATE usertotals SET {column} = {column} - 1 WHERE user_id = old.user_id"
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_totals_ai AFTER INSERT ON {table} "
+            f"WHEN new.user_id IS NOT NULL BEGIN {add}; END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_totals_ad AFTER DELETE ON {table} "
+            f"WHEN old.user_id IS NOT NULL BEGIN {remove}; END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_totals_au AFTER UPDATE OF user_id ON {table} "
+            f"WHEN old.user_id IS NOT new.user_id BEGIN "
+            f"{remove}; "
+            f"INSERT INTO usertotals (user_id, measurements, saved_days) SELECT new.user_id, {ones} "
+            f"WHERE new.user_id IS NOT NULL "
+            f"ON CONFLICT(user_id) DO UPDATE SET {column} = {column} + 1; END"
+        )
+    rebuild_user_totals(conn)
+
+# Applied in order; PRAGMA user_version stores how many have run. Append only.
+MIGRATIONS = [
+    _migrate_user_columns,
+    _migrate_user_date_indexes,
+    _migrate_food_search,
+    _migrate_nutrition_rollups,
+    _migrate_user_totals,
+    _migrate_food_search_folded,
+]
 
 def ensure_schema():
+    """Create the data directory and tables, then apply pending MIGRATIONS.
+
+    Run once at startup (the app's lifespan) or by scripts before touching the database.
+    """
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+        for n, migrate in enumerate(MIGRATIONS[version:], start=version + 1):
+            migrate(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {n}")
+
+async def warm_up_async_engine():
+    """Open the async pool's first connection on its own.
+
+    SQLAlchemy runs the first "connect" event of a (re)created pool under a
+    thread lock, and our PRAGMA listener awaits aiosqlite while holding it; two
+    first connections racing on one event loop would block the loop for good.
+    """
+    async with async_engine.connect() as conn:
+        await conn.exec_driver_sql("SELECT 1")
+
+def sqlite_maintenance(checkpoint: str = "PASSIVE"):
     with engine.connect() as conn:
-        cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('measurement')").fetchall()]
-        if "user_id" not in cols:
-            conn.exec_driver_sql("ALTER TABLE measurement ADD COLUMN user_id INTEGER")
-        ucols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('user')").fetchall()]
-        if "daily_kcal_goal" not in ucols:
-            conn.exec_driver_sql("ALTER TABLE user ADD COLUMN daily_kcal_goal INTEGER DEFAULT 2000")
+        conn.exec_driver_sql(f"PRAGMA wal_checkpoint({checkpoint})")
+        conn.exec_driver_sql("PRAGMA optimize")
+
+async def sqlite_maintenance_loop(interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(sqlite_maintenance)
+        except Exception:
+            logger.exception("SQLite maintenance failed")
@@ -0,0 +1,245 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, TypeVar
+from urllib.parse import urlparse
+from app.core.config import HTTP_WORKERS, HTTP_PER_HOST
+from app.core.metrics import observe_upstream
+
+USER_AGENT = "WeightTracker/1.0"
+
+T = TypeVar("T")
+
+# Scraping fan-out runs here; submitters wait on futures, never pool threads.
+fetch_pool = ThreadPoolExecutor(max_workers=HTTP_WORKERS, thread_name_prefix="http-fetch")
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+
+def http_session():
+    """Process-wide requests.Session with keep-alive pools sized to HTTP_PER_HOST."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_WORKERS, pool_maxsize=HTTP_PER_HOST)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+def _host_slot(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with _session_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(HTTP_PER_HOST)
+        return slot
+
+def remaining(deadline: float | None) -> float | None:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+def http_get(url: str, timeout: float, deadline: float | None = None, **kwargs):
+    """GET through the shared session, at most HTTP_PER_HOST at a time per host.
+
+    deadline is a time.monotonic() value; waiting for a host slot and the
+    request timeout are both clipped to it.
+    """
+    left = remaining(deadline)
+    slot = _host_slot(url)
+    if not slot.acquire(timeout=left):
+        raise TimeoutError(f"no connection slot for {url} before the deadline")
+    try:
+        left = remaining(deadline)
+        if left is not None:
+            if left <= 0:
+                raise TimeoutError(f"deadline passed before fetching {url}")
+            timeout = min(timeout, left)
+        t0 = time.perf_counter()
+        try:
+            r = http_session().get(url, timeout=timeout, **kwargs)
+        except Exception as e:
+            observe_upstream(urlparse(url).netloc, time.perf_counter() - t0, error=e)
+            raise
+        observe_upstream(urlparse(url).netloc, time.perf_counter() - t0, response=r)
+        return r
+    finally:
+        slot.release()
+
+class Scraped(list):
+    """scrape()'s items; timed_out is True when the deadline passed before want items were in,
+    so the list may be missing items that a slower run would have found."""
+    timed_out = False
+
+class _Scrape:
+    """Bookkeeping shared by scrape() and ascrape(), which only differ in how they wait.
+
+    take() records one finished search or fetch future and returns the links
+    not fetched yet; outcome() returns the items or re-raises the search error.
+    """
+
+    def __init__(self, want: int, key: Callable[[T], Hashable] | None, exclude: Iterable[Hashable]):
+        self.want = want
+        self.key = key
+        self.results: List[T] = []
+        self.seen_links = set()
+        self.seen_keys = set(exclude)
+        self.search_error: Exception | None = None
+        self.searched = False
+
+    @property
+    def full(self) -> bool:
+        return len(self.results) >= self.want
+
+    def take(self, future, is_search: bool) -> List[str]:
+        try:
+            value = future.result()
+        except Exception as e:
+            if is_search:
+                self.search_error = e
+            return []
+        if not is_search:
+            self._add(value)
+            return []
+        self.searched = True
+        links = []
+        for link in value:
+            if link not in self.seen_links:
+                self.seen_links.add(link)
+                links.append(link)
+        return links
+
+    def _add(self, item: Optional[T]) -> None:
+        if item is None or self.full:
+            return
+        if self.key is not None:
+            k = self.key(item)
+            if k in self.seen_keys:
+                return
+            self.seen_keys.add(k)
+        self.results.append(item)
+
+    def outcome(self, deadline: float, abandoned: bool) -> Scraped:
+        """abandoned: work was still pending when the loop stopped waiting."""
+        if not self.searched and self.search_error is not None:
+            raise self.search_error
+        scraped = Scraped(self.results)
+        # Fetches cut short by their deadline-clipped timeouts end as errors, not as pending work.
+        scraped.timed_out = not self.full and (abandoned or remaining(deadline) == 0)
+        return scraped
+
+def scrape(
+    queries: Iterable[str],
+    search: Callable[[str, float], List[str]],
+    fetch: Callable[[str, float], Optional[T]],
+    want: int,
+    deadline: float,
+    key: Callable[[T], Hashable] | None = None,
+    exclude: Iterable[Hashable] = (),
+) -> Scraped:
+    """Run searches in parallel on fetch_pool and fetch result links as they arrive.
+
+    search(query, deadline) returns links and fetch(url, deadline) returns an
+    item or None. Items whose key() was already seen or is in exclude are dropped. Returns once
+    want items are in or the deadline passes; queued work is cancelled, while
+    in-flight requests end at their (deadline-clipped) timeouts. If no search
+    succeeded at all, the last search error is raised. The result's timed_out
+    tells a short list cut off by the deadline from one that is complete.
+    """
+    state = _Scrape(want, key, exclude)
+    pending = {fetch_pool.submit(search, q, deadline): True for q in queries}
+    try:
+        while pending and not state.full:
+            done, _ = wait(pending, timeout=remaining(deadline), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for f in done:
+                for link in state.take(f, pending.pop(f)):
+                    pending[fetch_pool.submit(fetch, link, deadline)] = False
+    finally:
+        for f in pending:
+            f.cancel()
+    return state.outcome(deadline, bool(pending))
+
+# Async counterparts for async routes. The client is created lazily on the
+# running loop and closed by close_async_http() at shutdown.
+_async_client = None
+_async_host_slots: Dict[str, asyncio.Semaphore] = {}
+
+def async_http():
+    global _async_client
+    if _async_client is None:
+        import httpx
+        _async_client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=HTTP_WORKERS * HTTP_PER_HOST, max_keepalive_connections=HTTP_WORKERS),
+        )
+    return _async_client
+
+async def close_async_http() -> None:
+    global _async_client
+    client, _async_client = _async_client, None
+    _async_host_slots.clear()
+    if client is not None:
+        await client.aclose()
+
+async def ahttp_get(url: str, timeout: float, deadline: float | None = None, **kwargs):
+    """http_get for coroutines: same per-host limit, and the deadline bounds the whole call."""
+    host = urlparse(url).netloc
+    slot = _async_host_slots.get(host)
+    if slot is None:
+        slot = _async_host_slots[host] = asyncio.Semaphore(HTTP_PER_HOST)
+    left = remaining(deadline)
+    if left is not None:
+        timeout = min(timeout, left)
+    async def get():
+        async with slot:
+            t0 = time.perf_counter()
+            try:
+                r = await async_http().get(url, timeout=timeout, **kwargs)
+            except Exception as e:
+                observe_upstream(host, time.perf_counter() - t0, error=e)
+                raise
+            observe_upstream(host, time.perf_counter() - t0, response=r)
+            return r
+    t0 = time.perf_counter()
+    try:
+        return await asyncio.wait_for(get(), timeout)
+    except asyncio.TimeoutError as e:
+        observe_upstream(host, time.perf_counter() - t0, error=e)
+        raise
+
+async def ascrape(
+    queries: Iterable[str],
+    search: Callable[[str, float], Awaitable[List[str]]],
+    fetch: Callable[[str, float], Awaitable[Optional[T]]],
+    want: int,
+    deadline: float,
+    key: Callable[[T], Hashable] | None = None,
+    exclude: Iterable[Hashable] = (),
+) -> Scraped:
+    """scrape() with coroutines; outstanding requests are cancelled, not left to time out."""
+    state = _Scrape(want, key, exclude)
+    pending = {asyncio.ensure_future(search(q, deadline)): True for q in queries}
+    try:
+        while pending and not state.full:
+            done, _ = await asyncio.wait(pending, timeout=remaining(deadline), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for f in done:
+                for link in state.take(f, pending.pop(f)):
+                    pending[asyncio.ensure_future(fetch(link, deadline))] = False
+    finally:
+        for f in pending:
+            f.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    return state.outcome(deadline, bool(pending))
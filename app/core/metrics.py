@@ -0,0 +1,208 @@
+"""In-process metrics in the Prometheus text exposition format, served on /metrics.
+
+A few counters, gauges and histograms with fixed label names, kept in plain
+dicts under a lock; no client library needed. Each process (uvicorn worker)
+reports its own numbers.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from starlette.routing import Match
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative, last is +Inf), sum].
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        out = []
+        for k, (counts, total) in items:
+            running = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                running += c
+                bound = "+Inf" if le == float("inf") else _num(le)
+                le_label = f'le="{bound}"'
+                out.append(f"{self.name}_bucket{_labels(self.label_names, k, le_label)} {running}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, k)} {repr(round(total, 6))}")
+            out.append(f"{self.name}_count{_labels(self.label_names, k)} {running}")
+        return out
+
+def render_metrics() -> str:
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled, by route.", ("method", "route"))
+
+PLOT_RENDER = Histogram("plot_render_seconds", "Chart render time, including the worker round trip.", ("chart",))
+PLOT_LOCK_WAIT = Histogram("plot_lock_wait_seconds", "Wait for PLOT_LOCK (in-process rendering) or a render slot (worker pool).", ("mode",))
+PLOT_UNAVAILABLE = Counter("plot_unavailable_total", "Renders refused with 503.", ("reason",))
+
+UPSTREAM_LATENCY = Histogram("upstream_request_duration_seconds", "Outbound HTTP request latency by host.", ("host",))
+UPSTREAM_ERRORS = Counter("upstream_request_errors_total", "Outbound HTTP failures by host: exception type or HTTP status class.", ("host", "error"))
+
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed.")
+DB_QUERY_TIME = Histogram("db_query_duration_seconds", "SQL statement execution time.", buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+DB_REQUEST_QUERIES = Histogram("db_queries_per_request", "SQL statements per HTTP request, by route.", ("route",), buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250))
+DB_REQUEST_TIME = Histogram("db_time_per_request_seconds", "Time in SQL statements per HTTP request, by route.", ("route",))
+
+class _RequestDb:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+# Mutable, so queries run in worker threads (copied contexts) still add to the request's totals.
+_request_db: ContextVar[Optional[_RequestDb]] = ContextVar("request_db", default=None)
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement on a (sync) SQLAlchemy engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        DB_QUERIES.inc()
+        DB_QUERY_TIME.observe(elapsed)
+        stats = _request_db.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_started"):
+            conn.info["metrics_started"].pop()
+
+def observe_upstream(host: str, seconds: float, response=None, error: Optional[BaseException] = None) -> None:
+    UPSTREAM_LATENCY.observe(seconds, host)
+    if error is not None:
+        UPSTREAM_ERRORS.inc(host, type(error).__name__)
+    elif response is not None and response.status_code >= 400:
+        UPSTREAM_ERRORS.inc(host, f"{response.status_code // 100}xx")
+
+def _route_label(scope) -> str:
+    app = scope.get("app")
+    partial = None
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+        if match == Match.PARTIAL and partial is None:
+            partial = getattr(route, "path", None)
+    # Unknown paths share one label so scanners can't blow up the series count.
+    return partial or "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests, status and DB use per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method, route = scope["method"], _route_label(scope)
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        db = _RequestDb()
+        token = _request_db.set(db)
+        HTTP_IN_FLIGHT.inc(method, route)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_LATENCY.observe(time.perf_counter() - t0, method, route)
+            HTTP_IN_FLIGHT.dec(method, route)
+            HTTP_REQUESTS.inc(method, route, status[0])
+            DB_REQUEST_QUERIES.observe(db.queries, route)
+            DB_REQUEST_TIME.observe(db.seconds, route)
+            _request_db.reset(token)
@@ -0,0 +1,33 @@
+"""Keyset pagination on (date, id), newest first.
+
+A page asks for rows strictly before the cursor of the last row it showed, so
+its cost depends on the page size, not on how far back the user has scrolled.
+"""
+from datetime import date
+from typing import List, NamedTuple, Optional, Tuple
+
+Cursor = Tuple[date, int]
+
+MAX_ROW_ID = 2 ** 63 - 1
+
+class Page(NamedTuple):
+    items: List
+    total: int
+    next_cursor: Optional[str]
+
+def encode_cursor(d: date, row_id: int) -> str:
+    return f"{d.isoformat()}_{row_id}"
+
+def decode_cursor(s: str | None) -> Optional[Cursor]:
+    """(date, id) from encode_cursor's format; None (the first page) for anything else."""
+    if not s:
+        return None
+    d, _, row_id = s.partition("_")
+    # Row ids are positive SQLite integers; anything larger can't be bound as a parameter.
+    if not row_id.isdigit():
+        return None
+    try:
+        cursor = date.fromisoformat(d), int(row_id)
+    except ValueError:
+        return None
+    return cursor if cursor[1] <= MAX_ROW_ID else None
@@ -0,0 +1,134 @@
+"""Opt-in SQL profiler: per-request statement log, slow-query log and N+1 detection.
+
+With SQL_PROFILE=1, QueryProfilerMiddleware records every statement a request
+runs (normalised text and duration), logs statements slower than SQL_SLOW_MS
+and warns when one statement shape repeats SQL_N_PLUS_ONE or more times in a
+single request. max_queries(n) works regardless of the flag:
+
+    with max_queries(3):
+        get_meal_history(uid)   # QueryBudgetExceeded if this ran more than 3 statements
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, NamedTuple, Tuple
+from sqlalchemy import event
+from app.core.config import SQL_N_PLUS_ONE, SQL_PROFILE, SQL_SLOW_MS
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """Statement shape: literals become ?, IN lists collapse to (?), whitespace to one space."""
+    s = _STRING.sub("?", statement)
+    s = _NUMBER.sub("?", s)
+    s = _PARAM_LIST.sub("(?)", s)
+    return _SPACE.sub(" ", s).strip()
+
+class Query(NamedTuple):
+    shape: str
+    statement: str
+    seconds: float
+
+class QueryLog:
+    """Statements run while a profile_queries() block (or a profiled request) was active."""
+
+    def __init__(self):
+        self.queries: List[Query] = []
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    @property
+    def seconds(self) -> float:
+        return sum(q.seconds for q in self.queries)
+
+    def repeated(self, threshold: int = SQL_N_PLUS_ONE) -> List[Tuple[str, int]]:
+        """Shapes run at least `threshold` times, most frequent first: the N+1 suspects."""
+        counts = Counter(q.shape for q in self.queries)
+        return [(shape, n) for shape, n in counts.most_common() if n >= threshold]
+
+    def summary(self, limit: int = 10) -> str:
+        counts = Counter(q.shape for q in self.queries).most_common(limit)
+        return "\n".join(f"  {n:>4}x  {shape}" for shape, n in counts)
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, budget: int, log: QueryLog):
+        self.budget = budget
+        self.log = log
+        super().__init__(f"{len(log)} SQL statements, budget {budget}:\n{log.summary()}")
+
+# Every active log, innermost last; a statement is recorded in all of them. The
+# logs themselves are mutable, so worker threads running on a copied context
+# still add to the request's log.
+_active: ContextVar[Tuple[QueryLog, ...]] = ContextVar("sql_profile_logs", default=())
+
+@contextmanager
+def profile_queries() -> Iterator[QueryLog]:
+    log = QueryLog()
+    token = _active.set(_active.get() + (log,))
+    try:
+        yield log
+    finally:
+        _active.reset(token)
+
+@contextmanager
+def max_queries(n: int) -> Iterator[QueryLog]:
+    """Fail with QueryBudgetExceeded if the block runs more than n SQL statements."""
+    with profile_queries() as log:
+        yield log
+    if len(log) > n:
+        raise QueryBudgetExceeded(n, log)
+
+def profile_engine(engine) -> None:
+    """Feed statements on a (sync) SQLAlchemy engine to the active query logs."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if SQL_PROFILE or _active.get():
+            conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("profiler_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if elapsed * 1000 >= SQL_SLOW_MS:
+            logger.warning("Slow SQL (%.1f ms): %s", elapsed * 1000, _SPACE.sub(" ", statement).strip())
+        logs = _active.get()
+        if logs:
+            query = Query(normalize_sql(statement), statement, elapsed)
+            for log in logs:
+                log.queries.append(query)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("profiler_started"):
+            conn.info["profiler_started"].pop()
+
+class QueryProfilerMiddleware:
+    """ASGI middleware logging each request's SQL count and time, and any N+1 suspects."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with profile_queries() as log:
+            await self.app(scope, receive, send)
+        if not log:
+            return
+        where = f"{scope['method']} {scope['path']}"
+        logger.info("%s: %d SQL statements, %.1f ms", where, len(log), log.seconds * 1000)
+        for shape, n in log.repeated():
+            logger.warning("Possible N+1 in %s: %dx %s", where, n, shape)
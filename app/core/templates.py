@@ -1,3 +1,5 @@
 from fastapi.templating import Jinja2Templates
+from app.core.config import CHART_MODE
 
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["chart_mode"] = CHART_MODE
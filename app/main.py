@@ -2,14 +2,49 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
 import os
-from app.core.config import SESSION_SECRET
-from app.core.db import ensure_schema
-from app.routes import auth, base, plots, tips, recipes, kcal, meals
-
-app = FastAPI()
+import asyncio
+import contextlib
+from app.core.config import SESSION_SECRET, SQL_PROFILE, SQLITE_MAINTENANCE_INTERVAL, TIPS_REFRESH_INTERVAL
+from app.core.db import async_engine, ensure_schema, sqlite_maintenance, sqlite_maintenance_loop, warm_up_async_engine
+from app.core.http_client import close_async_http
+from app.core.metrics import MetricsMiddleware
+from app.core.profiler import QueryProfilerMiddleware
+from app.services.plotting import plot_renderer
+from app.services.tips import load_tip_pool, tip_refresh_loop
+from app.routes import auth, base, plots, tips, recipes, kcal, meals, api
+
+_background_tasks: list[asyncio.Task] = []
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(ensure_schema)
+    await warm_up_async_engine()
+    # Plot workers (or in-process pyplot) and tips warm up while the app starts serving.
+    plot_renderer.start()
+    await asyncio.to_thread(sqlite_maintenance)
+    await asyncio.to_thread(load_tip_pool)
+    if SQLITE_MAINTENANCE_INTERVAL > 0:
+        _background_tasks.append(asyncio.create_task(sqlite_maintenance_loop(SQLITE_MAINTENANCE_INTERVAL)))
+    if TIPS_REFRESH_INTERVAL > 0:
+        _background_tasks.append(asyncio.create_task(tip_refresh_loop(TIPS_REFRESH_INTERVAL)))
+    yield
+    for task in _background_tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    _background_tasks.clear()
+    plot_renderer.shutdown()
+    await close_async_http()
+    await async_engine.dispose()
+    await asyncio.to_thread(sqlite_maintenance, "TRUNCATE")
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
+if SQL_PROFILE:
+    app.add_middleware(QueryProfilerMiddleware)
+# Added last, so it wraps everything else and times the whole request.
+app.add_middleware(MetricsMiddleware)
 app.mount("/static", StaticFiles(directory="app/static") if os.path.exists("app/static") else StaticFiles(directory="app/templates"), name="static")
-ensure_schema()
 app.include_router(base.router)
 app.include_router(plots.router)
 app.include_router(tips.router)
@@ -17,6 +52,7 @@ app.include_router(recipes.router)
 app.include_router(kcal.router)
 app.include_router(meals.router)
 app.include_router(auth.router)
+app.include_router(api.router)
 
 def get_all_measurements(user_id: int | None = None):
     with Session(engine) as session:
@@ -1,8 +1,10 @@
 from datetime import date, datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 class User(SQLModel, table=True):
+    __table_args__ = (Index("ux_user_email", "email", unique=True),)
     id: Optional[int] = Field(default=None, primary_key=True)
     email: str
     password_hash: str
@@ -10,12 +12,14 @@ class User(SQLModel, table=True):
     daily_kcal_goal: int = Field(default=2000)
 
 class Measurement(SQLModel, table=True):
+    __table_args__ = (Index("ix_measurement_user_date", "user_id", "date"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     date: date
     weight_kg: float
     user_id: Optional[int] = Field(default=None)
 
 class Meal(SQLModel, table=True):
+    __table_args__ = (Index("ix_meal_user_date", "user_id", "date"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     date: date
     name: str
@@ -23,8 +27,82 @@ class Meal(SQLModel, table=True):
     user_id: Optional[int] = Field(default=None)
 
 class SavedDay(SQLModel, table=True):
+    __table_args__ = (Index("ux_savedday_user_date", "user_id", "date", unique=True),)
     id: Optional[int] = Field(default=None, primary_key=True)
     date: date
     user_id: Optional[int] = Field(default=None)
     total_kcal: int = Field(default=0)
     saved_at: datetime = Field(default_factory=datetime.utcnow)
+
+class DailyNutrition(SQLModel, table=True):
+    __table_args__ = (Index("ux_dailynutrition_user_date", "user_id", "date", unique=True),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    date: date
+    user_id: int
+    total_kcal: int = Field(default=0)
+    meal_count: int = Field(default=0)
+    goal_kcal: int = Field(default=2000)
+    delta_kcal: int = Field(default=0)
+
+class PeriodNutrition(SQLModel, table=True):
+    __table_args__ = (Index("ux_periodnutrition_user_period_start", "user_id", "period", "start", unique=True),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    period: str  # "week" (from Monday) or "month"
+    start: date
+    user_id: int
+    total_kcal: int = Field(default=0)
+    meal_count: int = Field(default=0)
+    days: int = Field(default=0)
+    goal_kcal: int = Field(default=0)
+    delta_kcal: int = Field(default=0)
+
+class UserTotals(SQLModel, table=True):
+    # Row counts per user, kept current by triggers (see _migrate_user_totals in app/core/db.py).
+    user_id: int = Field(primary_key=True)
+    measurements: int = Field(default=0)
+    saved_days: int = Field(default=0)
+
+class KcalLookup(SQLModel, table=True):
+    query: str = Field(primary_key=True)
+    max_results: int
+    results_json: str
+    fetched_at: float
+    hit_at: float
+
+class Food(SQLModel, table=True):
+    __table_args__ = (Index("ux_food_code", "code", unique=True),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    code: str
+    name_pl: Optional[str] = None
+    name_en: Optional[str] = None
+    brands: Optional[str] = None
+    kcal_100g: float
+    # fold_text() of the fields above, filled by the importer; the search index is built from these.
+    name_pl_folded: Optional[str] = None
+    name_en_folded: Optional[str] = None
+    brands_folded: Optional[str] = None
+
+class Recipe(SQLModel, table=True):
+    __table_args__ = (Index("ux_recipe_url", "url", unique=True),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    url: str
+    title: str
+    kcal: Optional[int] = None
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RecipeIngredient(SQLModel, table=True):
+    token: str = Field(primary_key=True)
+    recipe_id: int = Field(primary_key=True)
+
+class Tip(SQLModel, table=True):
+    __table_args__ = (Index("ux_tip_text", "text", unique=True),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    text: str
+    text_pl: str
+    source: str
+    harvested_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Translation(SQLModel, table=True):
+    source_hash: str = Field(primary_key=True)
+    target: str = Field(primary_key=True)
+    translated: str
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Request, Query
+from app.services.measurements import get_measurement_series, compute_weekly_changes, is_truthy
+from app.services.meals import get_daily_kcal_totals, parse_iso_date
+from app.services.meal_suggest import suggest_meals
+from app.services.nutrition import get_period_totals
+from app.services.series import columnar, rolling_mean
+
+router = APIRouter(prefix="/api")
+
+# Upper bound on ?points=, the client never needs more than a screen's width.
+MAX_POINTS = 5000
+
+@router.get("/series/weight")
+def weight_series(request: Request, filters: str | None = None, trend: str | None = None, points: int | None = Query(None, ge=3, le=MAX_POINTS)):
+    uid = request.session.get("uid")
+    if not uid:
+        return columnar([], {"weights": []})
+    series = get_measurement_series(uid, filters)
+    cols = {"weights": series.weights}
+    if is_truthy(trend):
+        cols["trend"] = rolling_mean(series.weights)
+    return columnar(series.dates, cols, points, shape_key="weights")
+
+@router.get("/series/weekly-changes")
+def weekly_changes_series(request: Request, filters: str | None = None, points: int | None = Query(None, ge=3, le=MAX_POINTS)):
+    uid = request.session.get("uid")
+    if not uid:
+        return columnar([], {"kg_per_week": []})
+    weekly = compute_weekly_changes(get_measurement_series(uid, filters))
+    return columnar(weekly.dates, {"kg_per_week": weekly.kg_per_week.tolist()}, points, shape_key="kg_per_week")
+
+@router.get("/series/meals-daily")
+def meals_daily_series(request: Request, date_str: str | None = None, from_date: str | None = None, to_date: str | None = None, product: str | None = None, points: int | None = Query(None, ge=3, le=MAX_POINTS)):
+    uid = request.session.get("uid")
+    if not uid:
+        return columnar([], {"kcal": []})
+    totals = get_daily_kcal_totals(
+        uid,
+        d_exact=parse_iso_date(date_str),
+        d_from=parse_iso_date(from_date),
+        d_to=parse_iso_date(to_date),
+        product=product,
+    )
+    return columnar([d.toordinal() for d, _ in totals], {"kcal": [t for _, t in totals]}, points, shape_key="kcal")
+
+@router.get("/meals/suggest")
+def meal_suggestions(request: Request, q: str = "", limit: int = Query(8, ge=1, le=20)):
+    uid = request.session.get("uid")
+    if not uid:
+        return {"suggestions": []}
+    return {"suggestions": suggest_meals(uid, q, limit)}
+
+@router.get("/series/meals-periods")
+def meals_period_series(request: Request, period: str = Query("week", pattern="^(week|month)$"), from_date: str | None = None, to_date: str | None = None):
+    uid = request.session.get("uid")
+    if not uid:
+        return columnar([], {"kcal": [], "avg_kcal": [], "delta_kcal": []})
+    rows = get_period_totals(uid, period, parse_iso_date(from_date), parse_iso_date(to_date))
+    return columnar(
+        [start.toordinal() for start, *_ in rows],
+        {
+            "kcal": [total for _, total, _, _, _ in rows],
+            "avg_kcal": [round(total / days) for _, total, _, days, _ in rows],
+            "delta_kcal": [delta for *_, delta in rows],
+        },
+    )
@@ -1,28 +1,35 @@
-from fastapi import APIRouter, Request, Form, UploadFile
-from fastapi.responses import RedirectResponse, StreamingResponse
-import io
+from fastapi import APIRouter, Request, Form, UploadFile, Query
+from fastapi.responses import RedirectResponse, StreamingResponse, JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from datetime import date, datetime
+from typing import Literal
 from sqlmodel import Session
 from app.core.db import engine
+from app.core.metrics import render_metrics
+from app.core.pagination import decode_cursor
 from app.core.templates import templates
 from app.models import Measurement
-from app.services.measurements import get_all_measurements, compute_weekly_changes, filter_by_periods
+from app.services.plotting import plot_cache_stats
+from app.services.meal_suggest import suggest_cache_stats
+from app.services.import_export import import_measurements_csv, export_chunks, gzip_chunks, parquet_available, EXPORT_MEDIA_TYPES
+from app.services.measurements import get_measurement_page, get_measurement_series, invalidate_measurements, measurement_cache_stats, compute_weekly_changes
 
 router = APIRouter()
 
 @router.get("/")
 def index(request: Request):
     uid = request.session.get("uid")
-    measurements = get_all_measurements(uid) if uid else []
-    weekly = compute_weekly_changes(measurements)
+    series = get_measurement_series(uid) if uid else None
+    measurements = series.rows(-10) if series else []
+    weekly = compute_weekly_changes(series) if series else []
     last_value = None
     last_date = None
     if measurements:
         last_value = round(float(measurements[-1].weight_kg), 1)
         last_date = measurements[-1].date
     if weekly:
-        last_change = round(float(weekly[-1]["kg_per_week"]), 3)
-        avg_weekly = round(float(sum(w["kg_per_week"] for w in weekly) / len(weekly)), 3)
+        last_change = round(float(weekly.kg_per_week[-1]), 3)
+        avg_weekly = round(float(weekly.kg_per_week.mean()), 3)
     else:
         last_change = None
         avg_weekly = None
@@ -46,50 +53,68 @@ def add_measurement(request: Request, date_str: str = Form(...), weight: float =
         m = Measurement(date=dt, weight_kg=weight, user_id=uid)
         session.add(m)
         session.commit()
+    invalidate_measurements(uid)
     return RedirectResponse("/", status_code=303)
 
 @router.get("/history")
-def history(request: Request, filters: str | None = None):
+def history(request: Request, filters: str | None = None, before: str | None = None, shown: int = 0):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
-    measurements = get_all_measurements(uid)
-    filtered = filter_by_periods(measurements, filters)
-    return templates.TemplateResponse("history.html", {"request": request, "measurements": filtered, "filters": filters or ""})
+    page = get_measurement_page(uid, filters, decode_cursor(before))
+    return templates.TemplateResponse("history.html", {
+        "request": request,
+        "measurements": page.items,
+        "total": page.total,
+        "next_cursor": page.next_cursor,
+        "shown": max(shown, 0) if before else 0,
+        "filters": filters or "",
+    })
 
 @router.get("/stats")
 def stats(request: Request, filters: str | None = None, trend: str | None = None):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
-    measurements = get_all_measurements(uid)
-    measurements = filter_by_periods(measurements, filters)
+    measurements = get_measurement_series(uid, filters)
     last_value = None
     last_date = None
     if measurements:
-        last_value = round(float(measurements[-1].weight_kg), 1)
-        last_date = measurements[-1].date
+        last = measurements.rows(-1)[0]
+        last_value = round(float(last.weight_kg), 1)
+        last_date = last.date
     if len(measurements) < 2:
         return templates.TemplateResponse("stats.html", {"request": request, "weekly": [], "last_change": None, "avg_weekly": None, "filters": filters or "", "trend": trend in ("1","true","yes","on"), "last_value": last_value, "last_date": last_date})
     weekly = compute_weekly_changes(measurements)
     if not weekly:
         return templates.TemplateResponse("stats.html", {"request": request, "weekly": [], "last_change": None, "avg_weekly": None, "filters": filters or "", "trend": trend in ("1","true","yes","on"), "last_value": last_value, "last_date": last_date})
-    last_change = round(float(weekly[-1]["kg_per_week"]), 3)
-    avg_weekly = round(float(sum(w["kg_per_week"] for w in weekly) / len(weekly)), 3)
+    last_change = round(float(weekly.kg_per_week[-1]), 3)
+    avg_weekly = round(float(weekly.kg_per_week.mean()), 3)
     return templates.TemplateResponse("stats.html", {"request": request, "weekly": weekly, "last_change": last_change, "avg_weekly": avg_weekly, "filters": filters or "", "trend": trend in ("1","true","yes","on"), "last_value": last_value, "last_date": last_date})
 
 @router.get("/export")
-def export_csv(request: Request):
+def export_csv(request: Request, dataset: Literal["measurements", "meals", "days"] = "measurements", fmt: Literal["csv", "ndjson", "parquet"] = Query("csv", alias="format")):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
-    measurements = get_all_measurements(uid)
-    rows = []
-    for m in measurements:
-        d = m.date.strftime("%d/%m/%Y")
-        rows.append(f"{d},{m.weight_kg}")
-    content = "\n".join(rows)
-    return StreamingResponse(io.BytesIO(content.encode("utf-8")), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=measurements.csv"})
+    if fmt == "parquet" and not parquet_available():
+        return PlainTextResponse("Eksport Parquet wymaga pakietu pyarrow.", status_code=501)
+    chunks = export_chunks(dataset, fmt, uid)
+    headers = {"Content-Disposition": f"attachment; filename={dataset}.{fmt}", "Vary": "Accept-Encoding"}
+    if fmt != "parquet" and "gzip" in request.headers.get("accept-encoding", ""):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
+
+@router.get("/cache-stats")
+def cache_stats(request: Request):
+    if not request.session.get("uid"):
+        return RedirectResponse("/login", status_code=303)
+    return JSONResponse({"measurements": measurement_cache_stats(), "plots": plot_cache_stats(), "meal_suggestions": suggest_cache_stats()})
+
+@router.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 @router.get("/import")
 def import_form(request: Request):
@@ -99,26 +124,14 @@ def import_form(request: Request):
 
 @router.post("/import")
 async def import_csv(request: Request, file: UploadFile):
-    data = await file.read()
-    text = data.decode("utf-8").strip().splitlines()
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
-    with Session(engine) as session:
-        for line in text:
-            parts = line.strip().split(",")
-            if len(parts) != 2:
-                continue
-            dstr, wstr = parts
-            try:
-                dt = datetime.strptime(dstr, "%d/%m/%Y").date()
-                w = round(float(wstr), 1)
-            except:
-                continue
-            m = Measurement(date=dt, weight_kg=w, user_id=uid)
-            session.add(m)
-        session.commit()
-    return RedirectResponse("/history", status_code=303)
+    try:
+        result = await run_in_threadpool(import_measurements_csv, uid, file.file)
+    finally:
+        invalidate_measurements(uid)
+    return templates.TemplateResponse("import.html", {"request": request, "result": result})
 
 @router.get("/edit/{measurement_id}")
 def edit_form(request: Request, measurement_id: int):
@@ -145,6 +158,7 @@ def edit_measurement(request: Request, measurement_id: int, date_str: str = Form
             m.weight_kg = weight
             session.add(m)
             session.commit()
+    invalidate_measurements(uid)
     return RedirectResponse("/history", status_code=303)
 
 @router.post("/delete/{measurement_id}")
@@ -157,4 +171,5 @@ def delete_measurement(request: Request, measurement_id: int):
         if m and m.user_id == uid:
             session.delete(m)
             session.commit()
+    invalidate_measurements(uid)
     return RedirectResponse("/history", status_code=303)
@@ -1,25 +1,30 @@
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import RedirectResponse
 from datetime import date, datetime
-from sqlmodel import Session, select
-from app.core.db import engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.db import async_engine
+from app.core.pagination import decode_cursor
 from app.core.templates import templates
-from app.models import Meal, User, SavedDay
+from app.models import DailyNutrition, Meal, User, SavedDay
+from app.services.meals import aget_meal_history_page, invalidate_meals, parse_iso_date
+from app.services.meal_suggest import record_meal_added, record_meal_removed
+from app.services.nutrition import record_goal_change, record_meal_change
 
 router = APIRouter()
 
 @router.get("/meals")
-def meals_today(request: Request):
+async def meals_today(request: Request):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
     today = date.today()
-    with Session(engine) as session:
-        meals = session.exec(
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        meals = (await session.exec(
             select(Meal).where(Meal.user_id == uid, Meal.date == today).order_by(Meal.id)
-        ).all()
+        )).all()
         total = sum(int(m.kcal) for m in meals) if meals else 0
-        user = session.exec(select(User).where(User.id == uid)).first()
+        user = (await session.exec(select(User).where(User.id == uid))).first()
         goal = user.daily_kcal_goal if user and user.daily_kcal_goal else 2000
         remaining = goal - total
     return templates.TemplateResponse(
@@ -35,7 +40,7 @@ def meals_today(request: Request):
     )
 
 @router.post("/meals/add")
-def add_meal(request: Request, name: str = Form(...), kcal: int = Form(...)):
+async def add_meal(request: Request, name: str = Form(...), kcal: int = Form(...)):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
@@ -43,14 +48,17 @@ def add_meal(request: Request, name: str = Form(...), kcal: int = Form(...)):
     kcal = int(kcal)
     if not name or kcal <= 0:
         return RedirectResponse("/meals", status_code=303)
-    with Session(engine) as session:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         m = Meal(date=date.today(), name=name, kcal=kcal, user_id=uid)
         session.add(m)
-        session.commit()
+        await session.run_sync(record_meal_change, uid, m.date, kcal, 1)
+        await session.commit()
+        invalidate_meals(uid)
+        record_meal_added(uid, m.id, m.date, name, kcal)
     return RedirectResponse("/meals", status_code=303)
 
 @router.post("/meals/goal")
-def set_goal(request: Request, goal: int = Form(...)):
+async def set_goal(request: Request, goal: int = Form(...)):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
@@ -59,16 +67,17 @@ def set_goal(request: Request, goal: int = Form(...)):
         g = 800
     if g > 10000:
         g = 10000
-    with Session(engine) as session:
-        u = session.get(User, uid)
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        u = await session.get(User, uid)
         if u:
             u.daily_kcal_goal = g
             session.add(u)
-            session.commit()
+            await session.run_sync(record_goal_change, uid, date.today(), g)
+            await session.commit()
     return RedirectResponse("/meals", status_code=303)
 
 @router.post("/meals/edit/{meal_id}")
-def edit_meal(request: Request, meal_id: int, name: str = Form(...), kcal: int = Form(...)):
+async def edit_meal(request: Request, meal_id: int, name: str = Form(...), kcal: int = Form(...)):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
@@ -76,31 +85,36 @@ def edit_meal(request: Request, meal_id: int, name: str = Form(...), kcal: int =
     kcal = int(kcal)
     if not name or kcal <= 0:
         return RedirectResponse("/meals", status_code=303)
-    with Session(engine) as session:
-        m = session.get(Meal, meal_id)
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        m = await session.get(Meal, meal_id)
         if m and m.user_id == uid:
+            old_name, old_kcal = m.name, int(m.kcal)
             m.name = name
             m.kcal = kcal
             session.add(m)
-            session.commit()
+            await session.run_sync(record_meal_change, uid, m.date, kcal - old_kcal, 0)
+            await session.commit()
+            invalidate_meals(uid)
+            record_meal_removed(uid, meal_id, old_name)
+            record_meal_added(uid, meal_id, m.date, name, kcal)
     return RedirectResponse("/meals", status_code=303)
 
 @router.post("/meals/save-day")
-def save_day(request: Request):
+async def save_day(request: Request):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
     today = date.today()
-    with Session(engine) as session:
-        meals = session.exec(
-            select(Meal).where(Meal.user_id == uid, Meal.date == today)
-        ).all()
-        if not meals:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        day = (await session.exec(
+            select(DailyNutrition).where(DailyNutrition.user_id == uid, DailyNutrition.date == today)
+        )).first()
+        if not day:
             return RedirectResponse("/meals", status_code=303)
-        total = sum(int(m.kcal) for m in meals)
-        existing = session.exec(
+        total = day.total_kcal
+        existing = (await session.exec(
             select(SavedDay).where(SavedDay.user_id == uid, SavedDay.date == today)
-        ).first()
+        )).first()
         if existing:
             existing.total_kcal = total
             existing.saved_at = datetime.utcnow()
@@ -108,60 +122,31 @@ def save_day(request: Request):
         else:
             sd = SavedDay(date=today, user_id=uid, total_kcal=total)
             session.add(sd)
-        session.commit()
+        await session.commit()
+    invalidate_meals(uid)
     return RedirectResponse("/meals/history", status_code=303)
 
 @router.get("/meals/history")
-def meals_history(request: Request, date_str: str | None = None, from_date: str | None = None, to_date: str | None = None, product: str | None = None):
+async def meals_history(request: Request, date_str: str | None = None, from_date: str | None = None, to_date: str | None = None, product: str | None = None, before: str | None = None):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
-    q_product = (product or "").strip().lower()
-    d_exact: date | None = None
-    d_from: date | None = None
-    d_to: date | None = None
-    try:
-        if date_str:
-            d_exact = datetime.strptime(date_str, "%Y-%m-%d").date()
-    except Exception:
-        d_exact = None
-    try:
-        if from_date:
-            d_from = datetime.strptime(from_date, "%Y-%m-%d").date()
-    except Exception:
-        d_from = None
-    try:
-        if to_date:
-            d_to = datetime.strptime(to_date, "%Y-%m-%d").date()
-    except Exception:
-        d_to = None
-    with Session(engine) as session:
-        stmt = select(SavedDay).where(SavedDay.user_id == uid).order_by(SavedDay.date.desc())
-        days = session.exec(stmt).all()
-        filtered_days = []
-        for sd in days:
-            if d_exact and sd.date != d_exact:
-                continue
-            if d_from and sd.date < d_from:
-                continue
-            if d_to and sd.date > d_to:
-                continue
-            meals = session.exec(
-                select(Meal).where(Meal.user_id == uid, Meal.date == sd.date).order_by(Meal.id)
-            ).all()
-            if q_product:
-                meals = [m for m in meals if q_product in (m.name or "").lower()]
-            total = sum(int(m.kcal) for m in meals) if meals else 0
-            filtered_days.append({
-                "date": sd.date,
-                "meals": meals,
-                "total_kcal": total,
-            })
+    page = await aget_meal_history_page(
+        uid,
+        d_exact=parse_iso_date(date_str),
+        d_from=parse_iso_date(from_date),
+        d_to=parse_iso_date(to_date),
+        product=product,
+        before=decode_cursor(before),
+    )
     return templates.TemplateResponse(
         "meals_history.html",
         {
             "request": request,
-            "days": filtered_days,
+            "days": page.items,
+            "total_days": page.total,
+            "next_cursor": page.next_cursor,
+            "before": before or "",
             "date_str": date_str or "",
             "from_date": from_date or "",
             "to_date": to_date or "",
@@ -171,13 +156,17 @@ def meals_history(request: Request, date_str: str | None = None, from_date: str
     )
 
 @router.post("/meals/delete/{meal_id}")
-def delete_meal(request: Request, meal_id: int):
+async def delete_meal(request: Request, meal_id: int):
     uid = request.session.get("uid")
     if not uid:
         return RedirectResponse("/login", status_code=303)
-    with Session(engine) as session:
-        m = session.get(Meal, meal_id)
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        m = await session.get(Meal, meal_id)
         if m and m.user_id == uid:
-            session.delete(m)
-            session.commit()
+            name = m.name
+            await session.delete(m)
+            await session.run_sync(record_meal_change, uid, m.date, -int(m.kcal), -1)
+            await session.commit()
+            invalidate_meals(uid)
+            record_meal_removed(uid, meal_id, name)
     return RedirectResponse("/meals", status_code=303)
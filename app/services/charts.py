@@ -0,0 +1,72 @@
+"""Chart drawing on plain data, so it can run in plot worker processes.
+
+Dates are day ordinals (date.toordinal()); every function returns PNG bytes.
+matplotlib is imported on first draw, so importing this module stays cheap.
+"""
+import io
+import numpy as np
+
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def _to_dates(ordinals) -> np.ndarray:
+    return (np.asarray(ordinals, dtype=np.int64) - _EPOCH_ORDINAL).astype("datetime64[D]")
+
+def _png(fig) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
+    _pyplot().close(fig)
+    return buf.getvalue()
+
+def _empty(text: str) -> bytes:
+    fig, ax = _pyplot().subplots(figsize=(10, 5))
+    ax.text(0.5, 0.5, text, ha="center", va="center", fontsize=20)
+    ax.axis("off")
+    return _png(fig)
+
+def _finish(fig, ax, title: str, xlabel: str, ylabel: str) -> bytes:
+    ax.grid(True)
+    ax.set_title(title, fontsize=18)
+    ax.set_xlabel(xlabel, fontsize=14)
+    ax.set_ylabel(ylabel, fontsize=14)
+    fig.tight_layout()
+    return _png(fig)
+
+def weight_history(dates, weights, trend: bool = False) -> bytes:
+    if not len(dates):
+        return _empty("Brak danych")
+    x = _to_dates(dates)
+    y = np.asarray(weights, dtype=np.float64)
+    fig, ax = _pyplot().subplots(figsize=(10, 5))
+    ax.plot(x, y, marker="o", linewidth=2)
+    if trend and len(y) >= 5:
+        # Centred 5-point rolling mean.
+        ax.plot(x[2:-2], np.convolve(y, np.ones(5) / 5, mode="valid"), color="orange", linewidth=3)
+    return _finish(fig, ax, "Przebieg masy ciała", "Data", "Masa (kg)")
+
+def daily_kcal(dates, totals) -> bytes:
+    if not len(dates):
+        return _empty("Brak danych")
+    fig, ax = _pyplot().subplots(figsize=(10, 5))
+    ax.plot(_to_dates(dates), totals, marker="o", linewidth=2)
+    return _finish(fig, ax, "Historia dziennych kalorii", "Data", "Kalorie (kcal)")
+
+def histogram(values, title: str, xlabel: str, ylabel: str) -> bytes:
+    if not len(values):
+        return _empty("Brak danych do histogramu")
+    fig, ax = _pyplot().subplots(figsize=(10, 5))
+    ax.hist(values, bins=16, edgecolor="black")
+    return _finish(fig, ax, title, xlabel, ylabel)
+
+def warm_up() -> None:
+    # Imports pyplot, loads fonts (building matplotlib's font cache on a first
+    # run) and the Agg renderer before the first real request.
+    fig, ax = _pyplot().subplots(figsize=(2, 1))
+    ax.plot([0, 1], [0, 1])
+    ax.set_title("Ąę")
+    _png(fig)
@@ -0,0 +1,199 @@
+"""Local copy of a food database (e.g. an Open Food Facts dump) for offline kcal lookups.
+
+Import a dump with:
+
+    python -m app.services.food_db path/to/openfoodfacts-products.jsonl.gz
+
+JSONL (one product per line) and the tab-separated CSV export are accepted,
+optionally gzip-compressed. The file is streamed and written in batches, so
+memory stays flat however large the dump is.
+"""
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO
+import csv
+import gzip
+import io
+import json
+import logging
+import sys
+from sqlalchemy import exc
+from sqlalchemy.engine import Connection
+from app.core.db import async_engine, engine, fold_text
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_URL = "https://world.openfoodfacts.org/product/{code}"
+
+# The *_folded columns feed the search index; they are merged the same way as the names.
+_UPSERT = (
+    "INSERT INTO food (code, name_pl, name_en, brands, kcal_100g, name_pl_folded, name_en_folded, brands_folded) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(code) DO UPDATE SET name_pl = coalesce(excluded.name_pl, name_pl), "
+    "name_en = coalesce(excluded.name_en, name_en), brands = coalesce(excluded.brands, brands), "
+    "kcal_100g = excluded.kcal_100g, name_pl_folded = coalesce(excluded.name_pl_folded, name_pl_folded), "
+    "name_en_folded = coalesce(excluded.name_en_folded, name_en_folded), "
+    "brands_folded = coalesce(excluded.brands_folded, brands_folded)"
+)
+
+class FoodImportResult(NamedTuple):
+    imported: int
+    skipped: int
+
+def kcal_from_kj(kj) -> float | None:
+    if kj is None:
+        return None
+    try:
+        return round(float(kj) / 4.184, 1)
+    except Exception:
+        return None
+
+def _float(v) -> float | None:
+    if v in (None, ""):
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def _clean(v) -> str | None:
+    v = (v or "").strip()
+    return v or None
+
+def _product_row(p: Dict, nutriments: Dict) -> Optional[tuple]:
+    code = _clean(p.get("code"))
+    kcal = _float(nutriments.get("energy-kcal_100g"))
+    if kcal is None:
+        kcal = kcal_from_kj(_float(nutriments.get("energy_100g")))
+    name_pl = _clean(p.get("product_name_pl"))
+    name_en = _clean(p.get("product_name_en")) or _clean(p.get("product_name"))
+    if not code or kcal is None or not 0 <= kcal <= 1000 or not (name_pl or name_en):
+        return None
+    brands = _clean(p.get("brands"))
+    folded = [fold_text(v) if v else None for v in (name_pl, name_en, brands)]
+    return (code, name_pl, name_en, brands, round(kcal, 1), *folded)
+
+def _jsonl_rows(text: TextIO) -> Iterator[Optional[tuple]]:
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            p = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        yield _product_row(p, p.get("nutriments") or {})
+
+def _csv_rows(text: TextIO) -> Iterator[Optional[tuple]]:
+    csv.field_size_limit(sys.maxsize)
+    # The OFF export is tab-separated and doesn't quote fields.
+    for p in csv.DictReader(text, delimiter="\t", quoting=csv.QUOTE_NONE):
+        yield _product_row(p, p)
+
+def _open_text(path: str) -> TextIO:
+    raw = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+    return io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="")
+
+def import_food_dump(path: str, batch_size: int = 5000) -> FoodImportResult:
+    """Upsert products with a known kcal/100 g from a dump file, keyed by barcode."""
+    name = path[:-3] if path.endswith(".gz") else path
+    rows = _csv_rows if name.endswith((".csv", ".tsv")) else _jsonl_rows
+    imported = skipped = 0
+    batch: List[tuple] = []
+    with _open_text(path) as text:
+        for row in rows(text):
+            if row is None:
+                skipped += 1
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(_UPSERT, batch)
+                imported += len(batch)
+                batch.clear()
+        if batch:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(_UPSERT, batch)
+            imported += len(batch)
+    return FoodImportResult(imported, skipped)
+
+def _trigrams(s: str) -> set:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def _fts_query(grams: set, op: str) -> str:
+    return f" {op} ".join('"' + g.replace('"', '""') + '"' for g in sorted(grams))
+
+def _like_prefix(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _search_foods(conn: Connection, query: str, limit: int, candidates: int) -> List[Dict]:
+    q = " ".join(fold_text(query).split())
+    if not q:
+        return []
+    grams = _trigrams(q)
+    fuzzy = False
+    try:
+        if grams:
+            sql = (
+                "SELECT f.code, f.name_pl, f.name_en, f.brands, f.kcal_100g, f.name_pl_folded, f.name_en_folded "
+                "FROM food_fts JOIN food f ON f.id = food_fts.rowid WHERE food_fts MATCH ? ORDER BY rank LIMIT ?"
+            )
+            rows = conn.exec_driver_sql(sql, (_fts_query(grams, "AND"), candidates)).fetchall()
+            fuzzy = not rows
+            if fuzzy:
+                rows = conn.exec_driver_sql(sql, (_fts_query(grams, "OR"), candidates)).fetchall()
+        else:
+            # One or two characters have no trigram; match names (or words in them) starting with q.
+            rows = conn.exec_driver_sql(
+                "SELECT code, name_pl, name_en, brands, kcal_100g, name_pl_folded, name_en_folded FROM food "
+                "WHERE name_pl_folded LIKE ?1 ESCAPE '\\' OR name_en_folded LIKE ?1 ESCAPE '\\' "
+                "OR name_pl_folded LIKE ?2 ESCAPE '\\' OR name_en_folded LIKE ?2 ESCAPE '\\' LIMIT ?3",
+                (_like_prefix(q), "% " + _like_prefix(q), candidates),
+            ).fetchall()
+    except exc.OperationalError as e:
+        logger.debug("Local food search unavailable: %s", e)
+        return []
+
+    scored = []
+    for code, name_pl, name_en, brands, kcal, pl_folded, en_folded in rows:
+        names = [n for n in (pl_folded, en_folded) if n]
+        if not names:
+            continue
+        if fuzzy:
+            score = max(len(grams & _trigrams(n)) / len(grams) for n in names)
+            if score < 0.5:
+                continue
+        else:
+            # Prefix hits before infix ones, then the tighter name.
+            score = max(2.0 if n.startswith(q) else 1.0 for n in names) - min(len(n) for n in names) / 1000
+        scored.append((score, code, name_pl or name_en, brands, kcal))
+    scored.sort(key=lambda r: -r[0])
+    return [
+        {
+            "name": f"{name} ({brands})" if brands else name,
+            "kcal_100g": kcal,
+            "source": PRODUCT_URL.format(code=code),
+        }
+        for _, code, name, brands, kcal in scored[:limit]
+    ]
+
+def search_foods(query: str, limit: int = 5, candidates: int = 200) -> List[Dict]:
+    """Prefix/substring matches first, then typo-tolerant trigram matches.
+
+    All trigrams of the query present (AND) means the query is a substring of
+    a name. Otherwise any trigram may match (OR) and candidates are re-ranked
+    by how many of the query's trigrams they share. Queries of one or two
+    characters have no trigram and use a LIKE prefix match on the folded names.
+    """
+    with engine.connect() as conn:
+        return _search_foods(conn, query, limit, candidates)
+
+async def asearch_foods(query: str, limit: int = 5, candidates: int = 200) -> List[Dict]:
+    async with async_engine.connect() as conn:
+        return await conn.run_sync(_search_foods, query, limit, candidates)
+
+if __name__ == "__main__":
+    from app.core.db import ensure_schema
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m app.services.food_db DUMP_FILE")
+    ensure_schema()
+    result = import_food_dump(sys.argv[1])
+    print(f"imported {result.imported}, skipped {result.skipped}")
@@ -0,0 +1,171 @@
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple
+from datetime import date
+import csv
+import io
+import json
+import zlib
+from app.core.db import engine
+
+EXPORT_DATASETS = {
+    "measurements": ("SELECT date, weight_kg FROM measurement WHERE user_id = ? ORDER BY date, id", ("date", "weight_kg")),
+    "meals": ("SELECT date, name, kcal FROM meal WHERE user_id = ? ORDER BY date, id", ("date", "name", "kcal")),
+    "days": ("SELECT date, total_kcal, saved_at FROM savedday WHERE user_id = ? ORDER BY date", ("date", "total_kcal", "saved_at")),
+}
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+class ImportResult(NamedTuple):
+    inserted: int
+    updated: int
+    skipped: int
+
+def _parse_line(line: str):
+    parts = line.strip().split(",")
+    if len(parts) != 2:
+        return None
+    dstr, wstr = parts
+    try:
+        d, m, y = dstr.split("/")
+        return date(int(y), int(m), int(d)).isoformat(), round(float(wstr), 1)
+    except ValueError:
+        return None
+
+def _flush(user_id: int, batch: Dict[str, float]) -> tuple[int, int]:
+    # Measurement (user_id, date) isn't unique (several weigh-ins a day are
+    # allowed), so find existing days with one index range scan instead of ON CONFLICT.
+    with engine.begin() as conn:
+        existing = {
+            r[0] for r in conn.exec_driver_sql(
+                "SELECT DISTINCT date FROM measurement WHERE user_id = ? AND date BETWEEN ? AND ?",
+                (user_id, min(batch), max(batch)),
+            )
+        }
+        updates = [(w, user_id, d) for d, w in batch.items() if d in existing]
+        inserts = [(d, w, user_id) for d, w in batch.items() if d not in existing]
+        if updates:
+            conn.exec_driver_sql("UPDATE measurement SET weight_kg = ? WHERE user_id = ? AND date = ?", updates)
+        if inserts:
+            conn.exec_driver_sql("INSERT INTO measurement (date, weight_kg, user_id) VALUES (?, ?, ?)", inserts)
+    return len(inserts), len(updates)
+
+def import_measurements_csv(user_id: int, fileobj: BinaryIO, batch_size: int = 5000) -> ImportResult:
+    """Upsert dd/mm/YYYY,weight lines by date, streaming the file in batches.
+
+    A date already recorded for the user gets its weight replaced; within the
+    file the last line for a date wins. Unparseable lines are skipped.
+    """
+    inserted = updated = skipped = 0
+    batch: Dict[str, float] = {}
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        for line in text:
+            if not line.strip():
+                continue
+            row = _parse_line(line)
+            if row is None:
+                skipped += 1
+                continue
+            batch[row[0]] = row[1]
+            if len(batch) >= batch_size:
+                i, u = _flush(user_id, batch)
+                inserted, updated = inserted + i, updated + u
+                batch.clear()
+        if batch:
+            i, u = _flush(user_id, batch)
+            inserted, updated = inserted + i, updated + u
+    finally:
+        text.detach()
+    return ImportResult(inserted, updated, skipped)
+
+def _pages(dataset: str, user_id: int, page_size: int) -> Iterator[List[tuple]]:
+    sql = EXPORT_DATASETS[dataset][0]
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).exec_driver_sql(sql, (user_id,))
+        while True:
+            rows = result.fetchmany(page_size)
+            if not rows:
+                return
+            yield rows
+
+def _csv_chunks(dataset: str, pages: Iterator[List[tuple]]) -> Iterator[bytes]:
+    if dataset == "measurements":
+        # Same dd/mm/YYYY,weight layout /import reads.
+        for rows in pages:
+            yield "".join(f"{d[8:10]}/{d[5:7]}/{d[:4]},{w}\n" for d, w in rows).encode("utf-8")
+        return
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    yield (",".join(EXPORT_DATASETS[dataset][1]) + "\n").encode("utf-8")
+    for rows in pages:
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+
+def _ndjson_chunks(dataset: str, pages: Iterator[List[tuple]]) -> Iterator[bytes]:
+    columns = EXPORT_DATASETS[dataset][1]
+    for rows in pages:
+        yield "".join(json.dumps(dict(zip(columns, r)), ensure_ascii=False) + "\n" for r in rows).encode("utf-8")
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream whose contents are drained after every row group."""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.parts.append(bytes(b))
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def drain(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts.clear()
+        return out
+
+def _parquet_chunks(dataset: str, pages: Iterator[List[tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    columns = EXPORT_DATASETS[dataset][1]
+    sink = _ChunkSink()
+    writer = None
+    for rows in pages:
+        table = pa.Table.from_pylist([dict(zip(columns, r)) for r in rows])
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        yield sink.drain()
+    if writer is None:
+        writer = pq.ParquetWriter(sink, pa.schema([(c, pa.string()) for c in columns]))
+    writer.close()
+    yield sink.drain()
+
+def parquet_available() -> bool:
+    import importlib.util
+    return importlib.util.find_spec("pyarrow") is not None
+
+def export_chunks(dataset: str, fmt: str, user_id: int, page_size: int = 2000) -> Iterator[bytes]:
+    """Encoded export of one user's dataset, one chunk per page of rows."""
+    pages = _pages(dataset, user_id, page_size)
+    encode = {"csv": _csv_chunks, "ndjson": _ndjson_chunks, "parquet": _parquet_chunks}[fmt]
+    for chunk in encode(dataset, pages):
+        if chunk:
+            yield chunk
+
+def gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
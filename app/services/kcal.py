@@ -1,5 +1,29 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import logging
 import re
+import threading
+import time
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import (
+    OPENFOODFACTS_SEARCH_URL,
+    KCAL_CACHE_TTL,
+    KCAL_CACHE_NEGATIVE_TTL,
+    KCAL_CACHE_STALE,
+    KCAL_CACHE_MAX_ENTRIES,
+    KCAL_DEADLINE,
+    KCAL_LOCAL_FIRST,
+)
+from app.core.db import async_engine, engine
+from app.core.http_client import ahttp_get, ascrape, http_get, scrape
+from app.models import KcalLookup
+from app.services.food_db import asearch_foods, kcal_from_kj, search_foods
+
+logger = logging.getLogger(__name__)
 
 def _parse_grams(s: str | None) -> float | None:
     if not s:
@@ -13,14 +37,6 @@ def _parse_grams(s: str | None) -> float | None:
     except Exception:
         return None
 
-def _kcal_from_kj(kj: float | None) -> float | None:
-    if kj is None:
-        return None
-    try:
-        return round(float(kj) / 4.184, 1)
-    except Exception:
-        return None
-
 def _extract_kcal(text: str) -> Dict:
     t = text.lower().replace(",", ".")
     kcal_100g = None
@@ -36,76 +52,199 @@ def _extract_kcal(text: str) -> Dict:
             kcal_100g = None
     return {"kcal_100g": kcal_100g}
 
-def _fallback_search_kcal(query: str, max_results: int) -> List[Dict]:
-    import requests
-    from bs4 import BeautifulSoup
-    from app.services.recipes import search_recipe_links
-    results: List[Dict] = []
-    queries = [
+def _kcal_from_page(url: str, markup: str) -> Dict | None:
+    from app.services.recipes import page_text
+    # Every _extract_kcal pattern needs one of these words; skip parsing otherwise.
+    raw = markup.lower()
+    if "kcal" not in raw and "kilocalories" not in raw:
+        return None
+    title, text = page_text(markup, url)
+    ex = _extract_kcal(text)
+    if ex["kcal_100g"] is None:
+        return None
+    return {"name": title, "kcal_100g": ex["kcal_100g"], "source": url}
+
+def _page_kcal(url: str, deadline: float) -> Dict | None:
+    r = http_get(url, timeout=6, deadline=deadline)
+    return _kcal_from_page(url, r.text)
+
+async def _apage_kcal(url: str, deadline: float) -> Dict | None:
+    r = await ahttp_get(url, timeout=6, deadline=deadline)
+    return await asyncio.to_thread(_kcal_from_page, url, r.text)
+
+def _fallback_queries(query: str) -> List[str]:
+    return [
         f"kcal {query} 100 g",
         f"kalorie {query} 100 g",
         f"{query} kalorie na 100 g",
         f"{query} calories per 100 g",
         f"{query} kcal / 100 g",
     ]
-    seen = set()
-    links: List[str] = []
-    for q in queries:
-        for l in search_recipe_links(q, limit=20):
-            if l not in seen:
-                seen.add(l)
-                links.append(l)
-    for url in links:
-        if len(results) >= max_results:
-            break
-        try:
-            r = requests.get(url, timeout=6, headers={"User-Agent": "WeightTracker/1.0"})
-            soup = BeautifulSoup(r.text, "html.parser")
-            title = soup.title.get_text(strip=True) if soup.title else url
-            text = soup.get_text(" ", strip=True)
-            ex = _extract_kcal(text)
-            if ex["kcal_100g"] is not None:
-                results.append({
-                    "name": title,
-                    "kcal_100g": ex["kcal_100g"],
-                    "source": url,
-                })
-        except Exception:
-            continue
-    return results
 
-def find_kcal_info(query: str, max_results: int = 5) -> List[Dict]:
-    import requests
-    url = "https://world.openfoodfacts.org/cgi/search.pl"
-    params = {
+def _off_params(query: str, max_results: int) -> Dict:
+    return {
         "search_terms": query,
         "search_simple": 1,
         "action": "process",
         "json": 1,
         "page_size": max_results,
     }
+
+def _off_results(data: Dict, max_results: int) -> List[Dict]:
     results: List[Dict] = []
+    products = data.get("products") or []
+    for p in products:
+        name = p.get("product_name") or p.get("product_name_pl") or p.get("brands") or "Produkt"
+        nutr = p.get("nutriments") or {}
+        kcal_100g = nutr.get("energy-kcal_100g")
+        if kcal_100g is None:
+            kcal_100g = kcal_from_kj(nutr.get("energy_100g"))
+        item = {
+            "name": name,
+            "kcal_100g": kcal_100g,
+            "source": p.get("url") or p.get("id") or "",
+        }
+        if item["kcal_100g"] is not None:
+            results.append(item)
+        if len(results) >= max_results:
+            break
+    return results
+
+def _lookup_upstream(query: str, max_results: int) -> Tuple[List[Dict], bool]:
+    """(results, complete); not complete when KCAL_DEADLINE cut the fallback scrape short."""
+    from app.services.recipes import search_recipe_links
+    deadline = time.monotonic() + KCAL_DEADLINE
+    try:
+        r = http_get(OPENFOODFACTS_SEARCH_URL, timeout=5, deadline=deadline, params=_off_params(query, max_results))
+        results = _off_results(r.json(), max_results)
+    except Exception:
+        results = []
+    if results:
+        return results, True
+    found = scrape(
+        _fallback_queries(query), lambda q, dl: search_recipe_links(q, 20, dl), _page_kcal, max_results, deadline
+    )
+    return found, not found.timed_out
+
+async def _alookup_upstream(query: str, max_results: int) -> Tuple[List[Dict], bool]:
+    from app.services.recipes import asearch_recipe_links
+    deadline = time.monotonic() + KCAL_DEADLINE
     try:
-        r = requests.get(url, params=params, timeout=5, headers={"User-Agent": "WeightTracker/1.0"})
-        data = r.json()
-        products = data.get("products") or []
-        for p in products:
-            name = p.get("product_name") or p.get("product_name_pl") or p.get("brands") or "Produkt"
-            nutr = p.get("nutriments") or {}
-            kcal_100g = nutr.get("energy-kcal_100g")
-            if kcal_100g is None:
-                kcal_100g = _kcal_from_kj(nutr.get("energy_100g"))
-            item = {
-                "name": name,
-                "kcal_100g": kcal_100g,
-                "source": p.get("url") or p.get("id") or "",
-            }
-            if item["kcal_100g"] is not None:
-                results.append(item)
-            if len(results) >= max_results:
-                break
+        r = await ahttp_get(OPENFOODFACTS_SEARCH_URL, timeout=5, deadline=deadline, params=_off_params(query, max_results))
+        results = _off_results(r.json(), max_results)
     except Exception:
         results = []
     if results:
-        return results
-    return _fallback_search_kcal(query, max_results)
+        return results, True
+    found = await ascrape(
+        _fallback_queries(query), lambda q, dl: asearch_recipe_links(q, 20, dl), _apage_kcal, max_results, deadline
+    )
+    return found, not found.timed_out
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="kcal-refresh")
+_refreshing: set = set()
+_refreshing_lock = threading.Lock()
+
+def _normalise_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def _read_cache(session: Session, key: str, max_results: int) -> Tuple[List[Dict] | None, bool]:
+    """(results, stale) for a usable cache entry, (None, False) otherwise."""
+    now = time.time()
+    row = session.get(KcalLookup, key)
+    if row is None or row.max_results < max_results:
+        return None, False
+    results = json.loads(row.results_json)
+    ttl = KCAL_CACHE_TTL if results else KCAL_CACHE_NEGATIVE_TTL
+    age = now - row.fetched_at
+    if age >= ttl + KCAL_CACHE_STALE:
+        return None, False
+    row.hit_at = now
+    session.add(row)
+    session.commit()
+    return results[:max_results], age >= ttl
+
+_UPSERT_LOOKUP = (
+    "INSERT INTO kcallookup (query, max_results, results_json, fetched_at, hit_at) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(query) DO UPDATE SET max_results = excluded.max_results, results_json = excluded.results_json, "
+    "fetched_at = excluded.fetched_at, hit_at = excluded.hit_at"
+)
+
+def _write_cache(session: Session, key: str, max_results: int, results: List[Dict]) -> None:
+    now = time.time()
+    # One statement, so concurrent first lookups of the same query (or a lookup
+    # racing a background refresh) don't both try to INSERT the key.
+    session.connection().exec_driver_sql(
+        _UPSERT_LOOKUP, (key, max_results, json.dumps(results, ensure_ascii=False), now, now)
+    )
+    session.commit()
+    excess = session.execute(select(func.count(KcalLookup.query))).scalar_one() - KCAL_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = select(KcalLookup.query).order_by(KcalLookup.hit_at).limit(excess)
+        session.execute(
+            delete(KcalLookup)
+            .where(KcalLookup.query.in_(oldest.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+
+def _store(key: str, max_results: int, results: List[Dict]) -> None:
+    with Session(engine) as session:
+        _write_cache(session, key, max_results, results)
+
+def _refresh(key: str, query: str, max_results: int) -> None:
+    try:
+        results, complete = _lookup_upstream(query, max_results)
+        # A lookup cut off by the deadline says nothing about the food; keep the stale entry.
+        if complete:
+            _store(key, max_results, results)
+    except Exception:
+        logger.exception("Background kcal refresh failed for %r", key)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+
+def _schedule_refresh(key: str, query: str, max_results: int) -> None:
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    _refresh_pool.submit(_refresh, key, query, max_results)
+
+def find_kcal_info(query: str, max_results: int = 5) -> List[Dict]:
+    """Local food table first, then the cached upstream lookup (KCAL_CACHE_* in config)."""
+    if KCAL_LOCAL_FIRST:
+        local = search_foods(query, limit=max_results)
+        if local:
+            return local
+    key = _normalise_query(query)
+    with Session(engine) as session:
+        cached, stale = _read_cache(session, key, max_results)
+    if cached is not None:
+        if stale:
+            _schedule_refresh(key, query, max_results)
+        return cached
+    results, complete = _lookup_upstream(query, max_results)
+    # Partial (deadline-cut) results are returned but not cached, so the next lookup tries again.
+    if complete:
+        _store(key, max_results, results)
+    return results
+
+async def afind_kcal_info(query: str, max_results: int = 5) -> List[Dict]:
+    """find_kcal_info for async routes. Stale entries are still refreshed on the thread pool."""
+    if KCAL_LOCAL_FIRST:
+        local = await asearch_foods(query, limit=max_results)
+        if local:
+            return local
+    key = _normalise_query(query)
+    async with AsyncSession(async_engine) as session:
+        cached, stale = await session.run_sync(_read_cache, key, max_results)
+    if cached is not None:
+        if stale:
+            _schedule_refresh(key, query, max_results)
+        return cached
+    results, complete = await _alookup_upstream(query, max_results)
+    if complete:
+        async with AsyncSession(async_engine) as session:
+            await session.run_sync(_write_cache, key, max_results, results)
+    return results
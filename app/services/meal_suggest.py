@@ -0,0 +1,128 @@
+from bisect import bisect_left, insort
+from datetime import date
+from typing import Dict, List
+import heapq
+import threading
+from app.core.cache import LRUCache
+from app.core.config import SUGGEST_CACHE_MAX_BYTES
+from app.core.db import engine, fold_text
+from app.services.meals import meals_version
+
+def _key(name: str) -> str:
+    return " ".join(fold_text(name).split())
+
+class _Entry:
+    __slots__ = ("name", "count", "last_id", "last_date", "last_kcal")
+
+    def __init__(self, name: str, meal_id: int, day: int, kcal: int):
+        self.name = name
+        self.count = 1
+        self.last_id = meal_id
+        self.last_date = day
+        self.last_kcal = kcal
+
+class MealNameIndex:
+    """One user's distinct meal names, sorted by folded name for prefix lookups.
+
+    Each name keeps how often it was eaten and its most recent entry, whose
+    spelling and kcal are what gets suggested.
+    """
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.entries: Dict[str, _Entry] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return 200 * len(self.keys) + sum(2 * len(k) for k in self.keys)
+
+    def add(self, meal_id: int, day: int, name: str, kcal: int) -> None:
+        key = _key(name)
+        with self.lock:
+            e = self.entries.get(key)
+            if e is None:
+                insort(self.keys, key)
+                self.entries[key] = _Entry(name, meal_id, day, kcal)
+                return
+            if e.last_id == meal_id:
+                return  # already picked up by the load that built this index
+            e.count += 1
+            if (day, meal_id) > (e.last_date, e.last_id):
+                e.name, e.last_id, e.last_date, e.last_kcal = name, meal_id, day, kcal
+
+    def remove(self, meal_id: int, name: str) -> bool:
+        """Forget one meal; False when the index can't tell what the name's latest entry is now."""
+        key = _key(name)
+        with self.lock:
+            e = self.entries.get(key)
+            if e is None:
+                return True
+            if e.last_id == meal_id:
+                return False
+            e.count -= 1
+            if e.count <= 0:
+                del self.entries[key]
+                self.keys.pop(bisect_left(self.keys, key))
+            return True
+
+    def suggest(self, prefix: str, limit: int, today: int) -> List[Dict]:
+        p = _key(prefix)
+        with self.lock:
+            lo = bisect_left(self.keys, p)
+            hi = bisect_left(self.keys, p + "\uffff")
+            # Frequency, discounted by how long ago the name was last eaten.
+            top = heapq.nlargest(
+                limit,
+                (self.entries[k] for k in self.keys[lo:hi]),
+                key=lambda e: (e.count / (1 + max(0, today - e.last_date) / 30), e.last_id),
+            )
+            return [{"name": e.name, "kcal": e.last_kcal, "count": e.count} for e in top]
+
+_indexes = LRUCache(SUGGEST_CACHE_MAX_BYTES, sizeof=lambda idx: idx.nbytes)
+# Writers bump meals_version before record_meal_*; holding this across the loader's version
+# check and put means a write either invalidates the load or finds the index cached.
+_publish_lock = threading.Lock()
+
+def _load_index(uid: int) -> MealNameIndex:
+    idx = MealNameIndex()
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT id, date, name, kcal FROM meal WHERE user_id = ? ORDER BY date, id", (uid,)
+        )
+        for meal_id, d, name, kcal in rows:
+            idx.add(meal_id, date.fromisoformat(d).toordinal(), name, int(kcal))
+    return idx
+
+def _get_index(uid: int) -> MealNameIndex:
+    idx = _indexes.get(uid)
+    if idx is None:
+        version = meals_version(uid)
+        idx = _load_index(uid)
+        # A write during the load may not have reached this index; don't keep it.
+        with _publish_lock:
+            if meals_version(uid) == version:
+                _indexes.put(uid, idx)
+    return idx
+
+def suggest_meals(uid: int, prefix: str, limit: int = 8) -> List[Dict]:
+    if not prefix.strip():
+        return []
+    return _get_index(uid).suggest(prefix, limit, date.today().toordinal())
+
+def record_meal_added(uid: int, meal_id: int, day: date, name: str, kcal: int) -> None:
+    """Apply a committed meal to a cached index; call after invalidate_meals(uid)."""
+    with _publish_lock:
+        idx = _indexes.get(uid)
+        if idx is not None:
+            idx.add(meal_id, day.toordinal(), name, kcal)
+
+def record_meal_removed(uid: int, meal_id: int, name: str) -> None:
+    """Forget a committed removal in a cached index; call after invalidate_meals(uid)."""
+    with _publish_lock:
+        idx = _indexes.get(uid)
+        if idx is not None and not idx.remove(meal_id, name):
+            _indexes.pop(uid)
+
+def suggest_cache_stats() -> dict:
+    return _indexes.stats()
@@ -0,0 +1,147 @@
+from typing import List, Dict, Optional, Tuple
+from datetime import date, datetime
+import threading
+from sqlalchemy import func, and_, tuple_
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import MEALS_HISTORY_PAGE_SIZE
+from app.core.db import async_engine, engine
+from app.core.pagination import Cursor, Page, encode_cursor
+from app.models import DailyNutrition, Meal, SavedDay, UserTotals
+
+_versions: Dict[int, int] = {}
+_versions_lock = threading.Lock()
+
+def meals_version(uid: int) -> int:
+    return _versions.get(uid, 0)
+
+def invalidate_meals(uid: int) -> None:
+    with _versions_lock:
+        _versions[uid] = _versions.get(uid, 0) + 1
+
+def parse_iso_date(s: str | None) -> Optional[date]:
+    if not s:
+        return None
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").date()
+    except Exception:
+        return None
+
+def _saved_day_filters(uid: int, d_exact: Optional[date], d_from: Optional[date], d_to: Optional[date]) -> list:
+    where = [SavedDay.user_id == uid]
+    if d_exact:
+        where.append(SavedDay.date == d_exact)
+    if d_from:
+        where.append(SavedDay.date >= d_from)
+    if d_to:
+        where.append(SavedDay.date <= d_to)
+    return where
+
+def _saved_dates(uid: int, d_exact: Optional[date], d_from: Optional[date], d_to: Optional[date]):
+    return select(SavedDay.date).where(*_saved_day_filters(uid, d_exact, d_from, d_to)).distinct()
+
+def _product_clause(q_product: str):
+    return func.instr(func.py_lower(Meal.name), q_product) > 0
+
+def _meal_history(session: Session, uid: int, d_exact: Optional[date], d_from: Optional[date], d_to: Optional[date], product: str | None, before: Optional[Cursor] = None, limit: Optional[int] = None) -> List[Dict]:
+    """Saved days, newest first, each with its meals; `before`/`limit` select one keyset page."""
+    q_product = (product or "").strip().lower()
+    if before is not None or limit is not None:
+        # One row per (user_id, date), so the page is a range of the unique index.
+        days_stmt = select(SavedDay.date, SavedDay.id).where(*_saved_day_filters(uid, d_exact, d_from, d_to))
+        if before is not None:
+            days_stmt = days_stmt.where(tuple_(SavedDay.date, SavedDay.id) < before)
+        days_stmt = days_stmt.order_by(SavedDay.date.desc(), SavedDay.id.desc()).limit(limit)
+        page = session.exec(days_stmt).all()
+        dates = [d for d, _ in page]
+        ids = {d: i for d, i in page}
+    else:
+        days_stmt = _saved_dates(uid, d_exact, d_from, d_to)
+        dates = session.exec(days_stmt.order_by(SavedDay.date.desc())).all()
+        ids = {}
+    if not dates:
+        return []
+    saved = days_stmt.subquery()
+    meals_stmt = (
+        select(Meal)
+        .join(saved, Meal.date == saved.c.date)
+        .where(Meal.user_id == uid)
+        .order_by(Meal.id)
+    )
+    if q_product:
+        meals_stmt = meals_stmt.where(_product_clause(q_product))
+    by_date: Dict[date, List[Meal]] = {d: [] for d in dates}
+    for m in session.exec(meals_stmt).all():
+        by_date[m.date].append(m)
+    rollups = {
+        r.date: r for r in session.exec(
+            select(DailyNutrition)
+            .join(saved, DailyNutrition.date == saved.c.date)
+            .where(DailyNutrition.user_id == uid)
+        ).all()
+    }
+    days = []
+    for d in dates:
+        r = rollups.get(d)
+        # A product filter totals only the matching meals; otherwise the rollup has the day's total.
+        total = sum(int(m.kcal) for m in by_date[d]) if q_product else (r.total_kcal if r else 0)
+        days.append({
+            "date": d,
+            "id": ids.get(d),
+            "meals": by_date[d],
+            "total_kcal": total,
+            "goal_kcal": r.goal_kcal if r else None,
+            "delta_kcal": r.delta_kcal if r else None,
+        })
+    return days
+
+def _meal_history_page(session: Session, uid: int, d_exact: Optional[date], d_from: Optional[date], d_to: Optional[date], product: str | None, before: Optional[Cursor], limit: int) -> Page:
+    days = _meal_history(session, uid, d_exact, d_from, d_to, product, before, limit + 1)
+    next_cursor = None
+    if len(days) > limit:
+        days = days[:limit]
+        next_cursor = encode_cursor(days[-1]["date"], days[-1]["id"])
+    if d_exact is None and d_from is None and d_to is None:
+        total = session.exec(select(UserTotals.saved_days).where(UserTotals.user_id == uid)).first() or 0
+    else:
+        # Date filters have no maintained count; this one walks the matching index range.
+        total = session.exec(
+            select(func.count()).select_from(SavedDay).where(*_saved_day_filters(uid, d_exact, d_from, d_to))
+        ).one()
+    return Page(days, total, next_cursor)
+
+def get_meal_history(uid: int, d_exact: Optional[date] = None, d_from: Optional[date] = None, d_to: Optional[date] = None, product: str | None = None) -> List[Dict]:
+    with Session(engine) as session:
+        return _meal_history(session, uid, d_exact, d_from, d_to, product)
+
+def get_meal_history_page(uid: int, d_exact: Optional[date] = None, d_from: Optional[date] = None, d_to: Optional[date] = None, product: str | None = None, before: Optional[Cursor] = None, limit: int = MEALS_HISTORY_PAGE_SIZE) -> Page:
+    with Session(engine) as session:
+        return _meal_history_page(session, uid, d_exact, d_from, d_to, product, before, limit)
+
+async def aget_meal_history_page(uid: int, d_exact: Optional[date] = None, d_from: Optional[date] = None, d_to: Optional[date] = None, product: str | None = None, before: Optional[Cursor] = None, limit: int = MEALS_HISTORY_PAGE_SIZE) -> Page:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        return await session.run_sync(_meal_history_page, uid, d_exact, d_from, d_to, product, before, limit)
+
+def get_daily_kcal_totals(uid: int, d_exact: Optional[date] = None, d_from: Optional[date] = None, d_to: Optional[date] = None, product: str | None = None) -> List[Tuple[date, int]]:
+    q_product = (product or "").strip().lower()
+    saved = _saved_dates(uid, d_exact, d_from, d_to).subquery()
+    if q_product:
+        # Only a product filter needs the meals themselves.
+        on = and_(Meal.user_id == uid, Meal.date == saved.c.date, _product_clause(q_product))
+        stmt = (
+            select(saved.c.date, func.coalesce(func.sum(Meal.kcal), 0))
+            .select_from(saved)
+            .outerjoin(Meal, on)
+            .group_by(saved.c.date)
+            .order_by(saved.c.date)
+        )
+    else:
+        on = and_(DailyNutrition.user_id == uid, DailyNutrition.date == saved.c.date)
+        stmt = (
+            select(saved.c.date, func.coalesce(DailyNutrition.total_kcal, 0))
+            .select_from(saved)
+            .outerjoin(DailyNutrition, on)
+            .order_by(saved.c.date)
+        )
+    with Session(engine) as session:
+        return [(d, int(total)) for d, total in session.exec(stmt).all()]
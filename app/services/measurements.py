@@ -1,9 +1,16 @@
-from typing import List, Optional
+from typing import List, Optional, Dict, NamedTuple, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
 from datetime import date
-import pandas as pd
+import threading
+from sqlalchemy import and_, or_, false, func, tuple_
+import numpy as np
 from sqlmodel import Session, select
+from app.core.cache import LRUCache
+from app.core.config import HISTORY_PAGE_SIZE, MEASUREMENT_CACHE_MAX_BYTES
 from app.core.db import engine
-from app.models import Measurement
+from app.core.pagination import Cursor, Page, encode_cursor
+from app.models import Measurement, UserTotals
 
 def get_all_measurements(user_id: Optional[int] = None) -> List[Measurement]:
     with Session(engine) as session:
@@ -12,57 +19,230 @@ def get_all_measurements(user_id: Optional[int] = None) -> List[Measurement]:
             stmt = stmt.where(Measurement.user_id == user_id)
         return session.exec(stmt).all()
 
-def compute_weekly_changes(measurements: List[Measurement]):
-    if not measurements or len(measurements) < 2:
-        return []
-    df = pd.DataFrame([{"date": m.date, "weight": m.weight_kg} for m in measurements])
-    df = df.sort_values("date")
-    df["date"] = pd.to_datetime(df["date"])
-    df["delta_days"] = df["date"].diff().dt.days
-    df["delta_weight"] = df["weight"].diff()
-    df = df.dropna()
-    df = df[df["delta_days"] > 0]
-    df["kg_per_week"] = df["delta_weight"] / df["delta_days"] * 7
-    weekly = df[["date", "kg_per_week"]].copy()
-    weekly["kg_per_week"] = weekly["kg_per_week"].round(3)
-    return weekly.to_dict(orient="records")
-
-def filter_by_periods(measurements: List[Measurement], filters_str: str | None):
+class MeasurementRow(NamedTuple):
+    id: int
+    date: date
+    weight_kg: float
+
+class MeasurementSeries:
+    """Date-ordered measurements of one user as flat arrays (dates are ordinals)."""
+    __slots__ = ("ids", "dates", "weights")
+
+    def __init__(self, ids: array, dates: array, weights: array):
+        self.ids = ids
+        self.dates = dates
+        self.weights = weights
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.ids, self.dates, self.weights)) + 200
+
+    def select(self, periods: List[Tuple[int, int]]) -> "MeasurementSeries":
+        ids, dates, weights = array("q"), array("l"), array("d")
+        for lo, hi in periods:
+            i, j = bisect_left(self.dates, lo), bisect_left(self.dates, hi)
+            ids.extend(self.ids[i:j])
+            dates.extend(self.dates[i:j])
+            weights.extend(self.weights[i:j])
+        return MeasurementSeries(ids, dates, weights)
+
+    def rows(self, start: Optional[int] = None, stop: Optional[int] = None) -> List[MeasurementRow]:
+        fromordinal = date.fromordinal
+        return [
+            MeasurementRow(i, fromordinal(d), w)
+            for i, d, w in zip(self.ids[start:stop], self.dates[start:stop], self.weights[start:stop])
+        ]
+
+_series_cache = LRUCache(MEASUREMENT_CACHE_MAX_BYTES, sizeof=lambda s: s.nbytes)
+_versions: Dict[int, int] = {}
+_versions_lock = threading.Lock()
+
+def _periods_clause(periods: List[Tuple[int, int]]):
+    return or_(false(), *(
+        and_(Measurement.date >= date.fromordinal(lo), Measurement.date < date.fromordinal(hi))
+        for lo, hi in periods
+    ))
+
+def _load_series(user_id: int, periods: Optional[List[Tuple[int, int]]] = None) -> MeasurementSeries:
+    stmt = (
+        select(Measurement.id, Measurement.date, Measurement.weight_kg)
+        .where(Measurement.user_id == user_id)
+        .order_by(Measurement.date, Measurement.id)
+    )
+    if periods is not None:
+        stmt = stmt.where(_periods_clause(periods))
+    ids, dates, weights = array("q"), array("l"), array("d")
+    with Session(engine) as session:
+        for mid, d, w in session.exec(stmt):
+            ids.append(mid)
+            dates.append(d.toordinal())
+            weights.append(w)
+    return MeasurementSeries(ids, dates, weights)
+
+def measurements_version(user_id: int) -> int:
+    return _versions.get(user_id, 0)
+
+def get_measurement_series(user_id: int, filters: str | None = None) -> MeasurementSeries:
+    periods = compile_periods(filters)
+    series = _series_cache.get(user_id)
+    if series is not None:
+        return series if periods is None else series.select(periods)
+    if periods is not None:
+        # A filtered load is a range scan on (user_id, date); it doesn't warm the cache.
+        return _load_series(user_id, periods)
+    version = measurements_version(user_id)
+    series = _load_series(user_id)
+    with _versions_lock:
+        # Don't cache a load that raced with a write.
+        if measurements_version(user_id) == version:
+            _series_cache.put(user_id, series)
+    return series
+
+def get_measurement_page(user_id: int, filters: str | None = None, before: Optional[Cursor] = None, limit: int = HISTORY_PAGE_SIZE) -> Page:
+    """Up to `limit` MeasurementRows older than `before`, newest first.
+
+    Served straight from the (user_id, date) index rather than the series
+    cache, so a page costs the same whether or not the user's series is loaded.
+    """
+    periods = compile_periods(filters)
+    where = [Measurement.user_id == user_id]
+    if periods is not None:
+        where.append(_periods_clause(periods))
+    stmt = select(Measurement.id, Measurement.date, Measurement.weight_kg).where(*where)
+    if before is not None:
+        stmt = stmt.where(tuple_(Measurement.date, Measurement.id) < before)
+    stmt = stmt.order_by(Measurement.date.desc(), Measurement.id.desc()).limit(limit + 1)
+    with Session(engine) as session:
+        rows = [MeasurementRow(mid, d, w) for mid, d, w in session.exec(stmt)]
+        if periods is None:
+            total = session.exec(select(UserTotals.measurements).where(UserTotals.user_id == user_id)).first() or 0
+        else:
+            # Filtered totals have no maintained count; this one walks the matching index range.
+            total = session.exec(select(func.count()).select_from(Measurement).where(*where)).one()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
+    return Page(rows, total, next_cursor)
+
+def get_measurements(user_id: int) -> List[MeasurementRow]:
+    return get_measurement_series(user_id).rows()
+
+def invalidate_measurements(user_id: int) -> None:
+    with _versions_lock:
+        _versions[user_id] = _versions.get(user_id, 0) + 1
+        _series_cache.pop(user_id)
+
+def measurement_cache_stats() -> dict:
+    return _series_cache.stats()
+
+class WeeklyChanges:
+    """Columnar kg/week changes; each point is dated at the later of its two measurements."""
+    __slots__ = ("dates", "kg_per_week")
+
+    def __init__(self, dates: np.ndarray, kg_per_week: np.ndarray):
+        self.dates = dates
+        self.kg_per_week = kg_per_week
+
+    def __len__(self) -> int:
+        return len(self.kg_per_week)
+
+    def __iter__(self):
+        for d, v in zip(self.dates.tolist(), self.kg_per_week.tolist()):
+            yield {"date": date.fromordinal(d), "kg_per_week": v}
+
+def weekly_changes(dates, weights) -> WeeklyChanges:
+    """dates are day ordinals, weights kg; both may be any buffer (array, ndarray)."""
+    d = np.asarray(dates, dtype=np.int64)
+    w = np.asarray(weights, dtype=np.float64)
+    if len(d) < 2:
+        return WeeklyChanges(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+    if np.any(d[1:] < d[:-1]):
+        order = np.argsort(d, kind="stable")
+        d, w = d[order], w[order]
+    delta_days = np.diff(d)
+    keep = delta_days > 0
+    kg = np.diff(w)[keep] / delta_days[keep] * 7
+    return WeeklyChanges(d[1:][keep], np.round(kg, 3))
+
+def compute_weekly_changes(measurements) -> WeeklyChanges:
+    if isinstance(measurements, MeasurementSeries):
+        return weekly_changes(measurements.dates, measurements.weights)
+    n = len(measurements)
+    dates = np.fromiter((m.date.toordinal() for m in measurements), dtype=np.int64, count=n)
+    weights = np.fromiter((m.weight_kg for m in measurements), dtype=np.float64, count=n)
+    return weekly_changes(dates, weights)
+
+def _period_bounds(token: str) -> Optional[Tuple[date, date]]:
+    """[start, end) of a period token: 2024, 2024-03, 2024Q2 or 2024H1."""
+    t = token.strip()
+    try:
+        if len(t) == 4 and t.isdigit():
+            y = int(t)
+            return date(y, 1, 1), date(y + 1, 1, 1)
+        if len(t) == 7 and t[4] == "-" and t[:4].isdigit() and t[5:7].isdigit():
+            y, mo, n = int(t[:4]), int(t[5:7]), 1
+        elif len(t) == 6 and t[:4].isdigit() and t[4] == "Q" and t[5] in "1234":
+            y, mo, n = int(t[:4]), (int(t[5]) - 1) * 3 + 1, 3
+        elif len(t) == 6 and t[:4].isdigit() and t[4] == "H" and t[5] in "12":
+            y, mo, n = int(t[:4]), 1 if t[5] == "1" else 7, 6
+        else:
+            return None
+        start = date(y, mo, 1)
+        end_mo = mo + n
+        end = date(y + 1, end_mo - 12, 1) if end_mo > 12 else date(y, end_mo, 1)
+        return start, end
+    except ValueError:
+        return None
+
+def compile_periods(filters_str: str | None) -> Optional[List[Tuple[int, int]]]:
+    """Merged, sorted [start, end) day-ordinal intervals for a comma-separated filter.
+
+    Tokens are periods (see _period_bounds) or inclusive ranges of them such as
+    2023-11..2024-02. Returns None when there is nothing to filter on; unknown
+    tokens match nothing.
+    """
     if not filters_str:
-        return measurements
+        return None
     tokens = [t.strip() for t in filters_str.split(",") if t.strip()]
     if not tokens:
+        return None
+    spans = []
+    for t in tokens:
+        if ".." in t:
+            a, _, b = t.partition("..")
+            first, last = _period_bounds(a), _period_bounds(b)
+            if first and last and first[0] < last[1]:
+                spans.append((first[0].toordinal(), last[1].toordinal()))
+        else:
+            bounds = _period_bounds(t)
+            if bounds:
+                spans.append((bounds[0].toordinal(), bounds[1].toordinal()))
+    spans.sort()
+    merged: List[Tuple[int, int]] = []
+    for lo, hi in spans:
+        if merged and lo <= merged[-1][1]:
+            if hi > merged[-1][1]:
+                merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+def filter_by_periods(measurements, filters_str: str | None):
+    periods = compile_periods(filters_str)
+    if periods is None:
         return measurements
+    if isinstance(measurements, MeasurementSeries):
+        return measurements.select(periods)
+    starts = [lo for lo, _ in periods]
     res = []
     for m in measurements:
-        d = m.date
-        ok = False
-        for t in tokens:
-            if len(t) == 4 and t.isdigit():
-                if d.year == int(t):
-                    ok = True
-            elif len(t) == 7 and t[4] == "-" and t[:4].isdigit() and t[5:7].isdigit():
-                y = int(t[:4])
-                mo = int(t[5:7])
-                if d.year == y and d.month == mo:
-                    ok = True
-            elif len(t) == 6 and t[:4].isdigit() and t[4] == "Q" and t[5] in "1234":
-                y = int(t[:4])
-                q = int(t[5])
-                start = (q - 1) * 3 + 1
-                end = start + 2
-                if d.year == y and start <= d.month <= end:
-                    ok = True
-            elif len(t) == 6 and t[:4].isdigit() and t[4] == "H" and t[5] in "12":
-                y = int(t[:4])
-                h = int(t[5])
-                start = 1 if h == 1 else 7
-                end = 6 if h == 1 else 12
-                if d.year == y and start <= d.month <= end:
-                    ok = True
-            if ok:
-                break
-        if ok:
+        d = m.date.toordinal()
+        k = bisect_right(starts, d) - 1
+        if k >= 0 and d < periods[k][1]:
             res.append(m)
     return res
 
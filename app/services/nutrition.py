@@ -0,0 +1,88 @@
+"""Per-user kcal rollups by day, week and month, kept current by every meal write.
+
+Writers call record_meal_change inside the transaction that changes the meal,
+so a rollup never disagrees with the meals it summarises.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+from app.core.db import engine
+
+PERIODS = {
+    "week": (lambda d: d - timedelta(days=d.weekday()), lambda s: s + timedelta(days=6)),
+    "month": (lambda d: d.replace(day=1), lambda s: s.replace(day=monthrange(s.year, s.month)[1])),
+}
+
+_UPSERT_DAY = (
+    "INSERT INTO dailynutrition (user_id, date, total_kcal, meal_count, goal_kcal, delta_kcal) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(user_id, date) DO UPDATE SET total_kcal = total_kcal + excluded.total_kcal, "
+    "meal_count = meal_count + excluded.meal_count, delta_kcal = total_kcal + excluded.total_kcal - goal_kcal"
+)
+
+_UPSERT_PERIOD = (
+    "INSERT INTO periodnutrition (user_id, period, start, total_kcal, meal_count, days, goal_kcal, delta_kcal) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(user_id, period, start) DO UPDATE SET total_kcal = excluded.total_kcal, "
+    "meal_count = excluded.meal_count, days = excluded.days, goal_kcal = excluded.goal_kcal, "
+    "delta_kcal = excluded.delta_kcal"
+)
+
+def _user_goal(conn: Connection, uid: int) -> int:
+    goal = conn.exec_driver_sql("SELECT daily_kcal_goal FROM user WHERE id = ?", (uid,)).scalar()
+    return goal or 2000
+
+def _refresh_periods(conn: Connection, uid: int, day: date) -> None:
+    # At most 31 daily rows per period, so re-summing beats tracking day counts incrementally.
+    for period, (start_of, end_of) in PERIODS.items():
+        start = start_of(day)
+        days, total, count, goal = conn.exec_driver_sql(
+            "SELECT count(*), coalesce(sum(total_kcal), 0), coalesce(sum(meal_count), 0), coalesce(sum(goal_kcal), 0) "
+            "FROM dailynutrition WHERE user_id = ? AND date BETWEEN ? AND ?",
+            (uid, start.isoformat(), end_of(start).isoformat()),
+        ).one()
+        if days:
+            conn.exec_driver_sql(_UPSERT_PERIOD, (uid, period, start.isoformat(), total, count, days, goal, total - goal))
+        else:
+            conn.exec_driver_sql(
+                "DELETE FROM periodnutrition WHERE user_id = ? AND period = ? AND start = ?",
+                (uid, period, start.isoformat()),
+            )
+
+def record_meal_change(session: Session, uid: int, day: date, kcal_delta: int, count_delta: int) -> None:
+    """Apply one meal insert (+kcal, +1), edit (+/-kcal, 0) or delete (-kcal, -1) to the rollups."""
+    conn = session.connection()
+    d = day.isoformat()
+    goal = _user_goal(conn, uid)
+    conn.exec_driver_sql(_UPSERT_DAY, (uid, d, kcal_delta, count_delta, goal, kcal_delta - goal))
+    conn.exec_driver_sql("DELETE FROM dailynutrition WHERE user_id = ? AND date = ? AND meal_count <= 0", (uid, d))
+    # A saved day's total follows later edits too.
+    conn.exec_driver_sql(
+        "UPDATE savedday SET total_kcal = total_kcal + ? WHERE user_id = ? AND date = ?", (kcal_delta, uid, d)
+    )
+    _refresh_periods(conn, uid, day)
+
+def record_goal_change(session: Session, uid: int, day: date, goal: int) -> None:
+    """A new daily goal applies from `day` on; earlier days keep the goal they had."""
+    conn = session.connection()
+    conn.exec_driver_sql(
+        "UPDATE dailynutrition SET goal_kcal = ?, delta_kcal = total_kcal - ? WHERE user_id = ? AND date >= ?",
+        (goal, goal, uid, day.isoformat()),
+    )
+    _refresh_periods(conn, uid, day)
+
+def get_period_totals(uid: int, period: str, d_from: Optional[date] = None, d_to: Optional[date] = None) -> List[Tuple[date, int, int, int, int]]:
+    """(start, total kcal, meals, days with meals, kcal vs goal) per week or month, oldest first."""
+    sql = "SELECT start, total_kcal, meal_count, days, delta_kcal FROM periodnutrition WHERE user_id = ? AND period = ?"
+    params: list = [uid, period]
+    if d_from:
+        sql += " AND start >= ?"
+        params.append(PERIODS[period][0](d_from).isoformat())
+    if d_to:
+        sql += " AND start <= ?"
+        params.append(d_to.isoformat())
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(sql + " ORDER BY start", tuple(params)).all()
+    return [(date.fromisoformat(s), total, count, days, delta) for s, total, count, days, delta in rows]
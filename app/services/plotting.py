@@ -1,15 +1,151 @@
-import io
+import hashlib
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
 from threading import Lock
-from fastapi import Response
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from typing import Callable, Hashable
+from fastapi import Request, Response
+from app.core.cache import LRUCache
+from app.core.config import PLOT_CACHE_MAX_BYTES, PLOT_WORKERS, PLOT_MAX_PENDING, PLOT_TIMEOUT
+from app.core.metrics import PLOT_LOCK_WAIT, PLOT_RENDER, PLOT_UNAVAILABLE
+from app.services import charts
 
+logger = logging.getLogger(__name__)
+
+# pyplot keeps global state, so in-process rendering must be serialised.
 PLOT_LOCK = Lock()
 
-def render_png(fig):
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return Response(buf.read(), media_type="image/png")
+class PlotUnavailable(Exception):
+    pass
+
+class PlotRenderer:
+    """Runs app.services.charts functions in a pool of worker processes.
+
+    At most max_pending renders are queued or running; callers beyond that wait
+    up to timeout seconds for a slot, then get PlotUnavailable. workers=0
+    renders in the calling thread under PLOT_LOCK.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=charts.warm_up,
+                )
+            return self._pool
+
+    def start(self) -> None:
+        """Warm up the renderers in the background: worker processes, or pyplot in this process."""
+        if self.workers > 0:
+            pool = self._get_pool()
+            for _ in range(self.workers):
+                pool.submit(int)
+        else:
+            threading.Thread(target=self._warm_up_here, name="plot-warm-up", daemon=True).start()
+
+    def _warm_up_here(self) -> None:
+        try:
+            with PLOT_LOCK:
+                charts.warm_up()
+        except Exception:
+            logger.exception("Plot warm-up failed")
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def render(self, chart: Callable[..., bytes], *args) -> bytes:
+        name = getattr(chart, "__name__", "chart")
+        t0 = time.perf_counter()
+        if self.workers <= 0:
+            with PLOT_LOCK:
+                t1 = time.perf_counter()
+                PLOT_LOCK_WAIT.observe(t1 - t0, "in-process")
+                png = chart(*args)
+            PLOT_RENDER.observe(time.perf_counter() - t1, name)
+            return png
+        if not self._slots.acquire(timeout=self.timeout):
+            PLOT_UNAVAILABLE.inc("queue_full")
+            raise PlotUnavailable("plot queue is full")
+        t1 = time.perf_counter()
+        PLOT_LOCK_WAIT.observe(t1 - t0, "pool")
+        try:
+            future = self._get_pool().submit(chart, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self.shutdown()
+            PLOT_UNAVAILABLE.inc("crashed")
+            raise PlotUnavailable("plot worker pool crashed")
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            png = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            PLOT_UNAVAILABLE.inc("timeout")
+            raise PlotUnavailable("plot render timed out")
+        except BrokenProcessPool:
+            self.shutdown()
+            PLOT_UNAVAILABLE.inc("crashed")
+            raise PlotUnavailable("plot worker pool crashed")
+        PLOT_RENDER.observe(time.perf_counter() - t1, name)
+        return png
+
+plot_renderer = PlotRenderer(PLOT_WORKERS, PLOT_MAX_PENDING, PLOT_TIMEOUT)
+
+_png_cache = LRUCache(PLOT_CACHE_MAX_BYTES, sizeof=lambda entry: len(entry[1]) + 100)
+
+def render_png(chart: Callable[..., bytes], *args) -> bytes:
+    return plot_renderer.render(chart, *args)
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def cached_png(request: Request, key: Hashable, draw: Callable[[], bytes]) -> Response:
+    """Serve a PNG from the render cache, drawing it on a miss.
+
+    key must include the user's data version so writes naturally miss. The ETag
+    is a content hash, so it stays valid across restarts and cache evictions.
+    """
+    entry = _png_cache.get(key)
+    if entry is None:
+        try:
+            png = draw()
+        except PlotUnavailable as e:
+            logger.warning("Plot %s not rendered: %s", key[0] if isinstance(key, tuple) else key, e)
+            return Response(status_code=503, headers={"Retry-After": "1", "Cache-Control": "no-store"})
+        entry = ('"' + hashlib.sha256(png).hexdigest()[:32] + '"', png)
+        _png_cache.put(key, entry)
+    etag, png = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(png, media_type="image/png", headers=headers)
+
+def plot_cache_stats() -> dict:
+    return _png_cache.stats()
+
+def clear_png_cache() -> None:
+    _png_cache.clear()
@@ -0,0 +1,78 @@
+"""Recipes seen while scraping, searchable offline by ingredient.
+
+RecipeIngredient is an inverted index: one row per (folded ingredient word,
+recipe). A search intersects the recipe ids of every query word, where a query
+word matches any indexed word it is a prefix of ("kurczak" finds "kurczaka"),
+like the substring check on live pages does.
+"""
+from typing import Iterable, List, Set
+import random
+import re
+from sqlalchemy.engine import Connection
+from app.core.db import async_engine, engine, fold_text
+
+def ingredient_tokens(text: str) -> Set[str]:
+    return set(re.findall(r"[^\W\d_]{3,}", fold_text(text)))
+
+def _save(conn: Connection, url: str, title: str, kcal: int | None, ingredients: str) -> None:
+    tokens = ingredient_tokens(ingredients)
+    if not tokens:
+        return  # nothing a search could find it by ("2 x 100 g", "½ ł")
+    conn.exec_driver_sql(
+        "INSERT INTO recipe (url, title, kcal, fetched_at) VALUES (?, ?, ?, datetime('now')) "
+        "ON CONFLICT(url) DO UPDATE SET title = excluded.title, kcal = excluded.kcal, fetched_at = excluded.fetched_at",
+        (url, title, kcal),
+    )
+    recipe_id = conn.exec_driver_sql("SELECT id FROM recipe WHERE url = ?", (url,)).scalar()
+    conn.exec_driver_sql("DELETE FROM recipeingredient WHERE recipe_id = ?", (recipe_id,))
+    conn.exec_driver_sql(
+        "INSERT INTO recipeingredient (token, recipe_id) VALUES (?, ?)",
+        [(t, recipe_id) for t in tokens],
+    )
+
+def save_recipe(url: str, title: str, kcal: int | None, ingredients: str) -> None:
+    """Insert or refresh a recipe and its index rows; skipped when no ingredient word is indexable."""
+    with engine.begin() as conn:
+        _save(conn, url, title, kcal, ingredients)
+
+async def asave_recipe(url: str, title: str, kcal: int | None, ingredients: str) -> None:
+    async with async_engine.begin() as conn:
+        await conn.run_sync(_save, url, title, kcal, ingredients)
+
+def _search(conn: Connection, ingredients: List[str], limit: int, exclude_titles: Iterable[str]) -> List[dict]:
+    words = sorted({w for ing in ingredients for w in ingredient_tokens(ing)})
+    if not words:
+        return []
+    ids: Set[int] | None = None
+    for w in words:
+        found = {
+            r[0] for r in conn.exec_driver_sql(
+                "SELECT recipe_id FROM recipeingredient WHERE token >= ? AND token < ?", (w, w + "\uffff")
+            )
+        }
+        ids = found if ids is None else ids & found
+        if not ids:
+            return []
+    # Random pick, with headroom for duplicate or excluded titles.
+    pick = random.sample(sorted(ids), min(len(ids), limit * 4))
+    placeholders = ",".join("?" * len(pick))
+    rows = conn.exec_driver_sql(
+        f"SELECT id, title, url, kcal FROM recipe WHERE id IN ({placeholders})", tuple(pick)
+    ).fetchall()
+    order = {recipe_id: i for i, recipe_id in enumerate(pick)}
+    seen = set(exclude_titles)
+    results: List[dict] = []
+    for _, title, url, kcal in sorted(rows, key=lambda r: order[r[0]]):
+        if title not in seen and len(results) < limit:
+            seen.add(title)
+            results.append({"title": title, "url": url, "kcal": kcal})
+    return results
+
+def search_corpus(ingredients: List[str], limit: int, exclude_titles: Iterable[str] = ()) -> List[dict]:
+    """Up to limit random stored recipes that contain every ingredient."""
+    with engine.connect() as conn:
+        return _search(conn, ingredients, limit, exclude_titles)
+
+async def asearch_corpus(ingredients: List[str], limit: int, exclude_titles: Iterable[str] = ()) -> List[dict]:
+    async with async_engine.connect() as conn:
+        return await conn.run_sync(_search, ingredients, limit, exclude_titles)
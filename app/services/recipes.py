@@ -1,14 +1,26 @@
 from urllib.parse import urljoin, urlparse, parse_qs, unquote
+import asyncio
+import html
+import importlib.util
+import json
+import logging
 import re
 import random
+import time
+from app.core.config import DUCKDUCKGO_HTML_URL, RECIPES_DEADLINE
+from app.core.http_client import ahttp_get, ascrape, http_get, scrape
+from app.services.recipe_corpus import asave_recipe, asearch_corpus, save_recipe, search_corpus
 
-def search_recipe_links(query: str, limit: int = 20) -> list[str]:
-    import requests
+logger = logging.getLogger(__name__)
+
+# lxml is optional; it parses the same markup several times faster.
+_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+_LD_JSON = re.compile(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+
+def _result_links(markup: str, limit: int) -> list[str]:
     from bs4 import BeautifulSoup
-    url = "https://duckduckgo.com/html/"
-    params = {"q": query}
-    r = requests.get(url, params=params, timeout=8, headers={"User-Agent": "WeightTracker/1.0"})
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = BeautifulSoup(markup, _PARSER)
     links: list[str] = []
     def normalize(href: str | None) -> str | None:
         if not href:
@@ -34,13 +46,60 @@ def search_recipe_links(query: str, limit: int = 20) -> list[str]:
     random.shuffle(links)
     return links
 
-def fetch_recipe_details(url: str) -> dict:
-    import requests
+def search_recipe_links(query: str, limit: int = 20, deadline: float | None = None) -> list[str]:
+    r = http_get(DUCKDUCKGO_HTML_URL, timeout=8, deadline=deadline, params={"q": query})
+    return _result_links(r.text, limit)
+
+async def asearch_recipe_links(query: str, limit: int = 20, deadline: float | None = None) -> list[str]:
+    r = await ahttp_get(DUCKDUCKGO_HTML_URL, timeout=8, deadline=deadline, params={"q": query})
+    return await asyncio.to_thread(_result_links, r.text, limit)
+
+def page_text(markup: str, url: str) -> tuple[str, str]:
+    """Title and visible text of an HTML page."""
     from bs4 import BeautifulSoup
-    r = requests.get(url, timeout=8, headers={"User-Agent": "WeightTracker/1.0"})
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = BeautifulSoup(markup, _PARSER)
     title = soup.title.get_text(strip=True) if soup.title else url
-    text = soup.get_text(" ", strip=True).lower()
+    return title, soup.get_text(" ", strip=True)
+
+_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.S | re.I)
+
+def _ld_recipe(markup: str) -> dict | None:
+    """Title, ingredient lines and kcal of the first schema.org Recipe in the page's JSON-LD.
+
+    None unless it has both a title (the recipe's name, else the page title) and
+    an ingredient list, so article and listing pages never reach the corpus.
+    """
+    found: list[dict] = []
+    def walk(node):
+        if isinstance(node, list):
+            for n in node:
+                walk(n)
+        elif isinstance(node, dict):
+            if isinstance(node.get("recipeIngredient"), list):
+                found.append(node)
+            for k in ("@graph", "mainEntity"):
+                walk(node.get(k))
+    for block in _LD_JSON.findall(markup):
+        try:
+            walk(json.loads(block))
+        except ValueError:
+            continue
+    for node in found:
+        ingredients = [str(x).strip() for x in node["recipeIngredient"] if str(x).strip()]
+        title = str(node.get("name") or "").strip()
+        if not title:
+            m = _TITLE.search(markup)
+            title = html.unescape(m.group(1)).strip() if m else ""
+        if not ingredients or not title:
+            continue
+        nutrition = node.get("nutrition")
+        m = re.search(r"\d{2,4}", str(nutrition.get("calories") or "")) if isinstance(nutrition, dict) else None
+        return {"title": html.unescape(title), "ingredients": ingredients, "kcal": int(m.group()) if m else None}
+    return None
+
+def _recipe_from_html(url: str, markup: str) -> dict:
+    title, text = page_text(markup, url)
+    text = text.lower()
     kcal = None
     m = re.search(r"(\d{2,4})\s?kcal", text)
     if not m:
@@ -54,38 +113,93 @@ def fetch_recipe_details(url: str) -> dict:
             kcal = None
     return {"title": title, "url": url, "kcal": kcal, "text": text}
 
-def find_recipes(ingredients: list[str], max_results: int = 5) -> list[dict]:
-    queries = [
+def fetch_recipe_details(url: str, deadline: float | None = None) -> dict:
+    r = http_get(url, timeout=8, deadline=deadline)
+    return _recipe_from_html(url, r.text)
+
+def _candidate(url: str, markup: str, tokens: list[str]) -> dict | None:
+    # Visible text is a subset of the (unescaped) markup, so most pages can be
+    # ruled out without parsing them. Words are checked separately because a
+    # multi-word ingredient may be split by tags in the raw markup.
+    raw = html.unescape(markup).lower()
+    if any(word not in raw for t in tokens for word in t.split()):
+        return None
+    return _recipe_from_html(url, markup)
+
+def _read_page(url: str, markup: str, tokens: list[str]) -> tuple[tuple | None, dict | None]:
+    """(corpus entry or None, the page's details when it may match tokens, else None)."""
+    recipe = _ld_recipe(markup)
+    d = _candidate(url, markup, tokens)
+    if recipe is None:
+        return None, d
+    kcal = recipe["kcal"]
+    if kcal is None and d is not None:
+        kcal = d["kcal"]
+    return (url, recipe["title"], kcal, " ".join(recipe["ingredients"])), d
+
+def _matches(d: dict | None, tokens: list[str]) -> bool:
+    return d is not None and all(t in d["text"] for t in tokens)
+
+def _matching_recipe(url: str, tokens: list[str], deadline: float) -> dict | None:
+    r = http_get(url, timeout=8, deadline=deadline)
+    entry, d = _read_page(url, r.text, tokens)
+    # Every recipe page is stored, whether or not it has this search's ingredients.
+    if entry is not None:
+        try:
+            save_recipe(*entry)
+        except Exception:
+            logger.exception("Could not store recipe %s", url)
+    return d if _matches(d, tokens) else None
+
+async def _amatching_recipe(url: str, tokens: list[str], deadline: float) -> dict | None:
+    r = await ahttp_get(url, timeout=8, deadline=deadline)
+    entry, d = await asyncio.to_thread(_read_page, url, r.text, tokens)
+    if entry is not None:
+        try:
+            await asave_recipe(*entry)
+        except Exception:
+            logger.exception("Could not store recipe %s", url)
+    return d if _matches(d, tokens) else None
+
+def _queries(ingredients: list[str]) -> list[str]:
+    return [
         "przepis " + " ".join(ingredients),
         "przepis na " + " ".join(ingredients),
         "recipe " + " ".join(ingredients),
         "danie " + " ".join(ingredients),
     ]
-    seen = set()
-    links: list[str] = []
-    for q in queries:
-        for l in search_recipe_links(q, limit=20):
-            if l not in seen:
-                seen.add(l)
-                links.append(l)
-    random.shuffle(links)
-    results: list[dict] = []
-    for link in links:
-        try:
-            d = fetch_recipe_details(link)
-        except Exception:
-            continue
-        ok = True
-        for ing in ingredients:
-            token = ing.strip().lower()
-            if token and token not in d["text"]:
-                ok = False
-                break
-        if ok:
-            titles = {r["title"] for r in results}
-            if d["title"] in titles:
-                continue
-            results.append(d)
-            if len(results) >= max_results:
-                break
-    return results
+
+def _tokens(ingredients: list[str]) -> list[str]:
+    return [t for t in (ing.strip().lower() for ing in ingredients) if t]
+
+def find_recipes(ingredients: list[str], max_results: int = 5) -> list[dict]:
+    """Stored recipes first; the web is searched only for the shortfall."""
+    local = search_corpus(ingredients, max_results)
+    if len(local) >= max_results:
+        return local
+    tokens = _tokens(ingredients)
+    return local + scrape(
+        _queries(ingredients),
+        lambda q, deadline: search_recipe_links(q, 20, deadline),
+        lambda url, deadline: _matching_recipe(url, tokens, deadline),
+        max_results - len(local),
+        time.monotonic() + RECIPES_DEADLINE,
+        key=lambda d: d["title"],
+        exclude=[d["title"] for d in local],
+    )
+
+async def afind_recipes(ingredients: list[str], max_results: int = 5) -> list[dict]:
+    """find_recipes for async routes; parsing runs in worker threads, never on the loop."""
+    local = await asearch_corpus(ingredients, max_results)
+    if len(local) >= max_results:
+        return local
+    tokens = _tokens(ingredients)
+    return local + await ascrape(
+        _queries(ingredients),
+        lambda q, deadline: asearch_recipe_links(q, 20, deadline),
+        lambda url, deadline: _amatching_recipe(url, tokens, deadline),
+        max_results - len(local),
+        time.monotonic() + RECIPES_DEADLINE,
+        key=lambda d: d["title"],
+        exclude=[d["title"] for d in local],
+    )
@@ -0,0 +1,48 @@
+"""Columnar chart series for the JSON API: ISO dates, rolling means, LTTB."""
+from typing import List, Optional
+import numpy as np
+
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+def iso_dates(ordinals) -> List[str]:
+    days = np.asarray(ordinals, dtype=np.int64) - _EPOCH_ORDINAL
+    return days.astype("datetime64[D]").astype(str).tolist()
+
+def rolling_mean(values, window: int = 5) -> List[Optional[float]]:
+    """Centred rolling mean; positions without a full window are None."""
+    y = np.asarray(values, dtype=np.float64)
+    out: List[Optional[float]] = [None] * len(y)
+    if len(y) >= window:
+        half = window // 2
+        out[half:len(y) - (window - 1 - half)] = np.round(np.convolve(y, np.ones(window) / window, mode="valid"), 3).tolist()
+    return out
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of at most threshold points that keep the shape of y(x)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+def columnar(x_ordinals, columns: dict, points: Optional[int] = None, shape_key: Optional[str] = None) -> dict:
+    """{"dates": [...], **columns}, optionally LTTB-downsampled on columns[shape_key]."""
+    x = np.asarray(x_ordinals, dtype=np.int64)
+    cols = {k: list(v) for k, v in columns.items()}
+    if points and shape_key and len(x) > points:
+        idx = lttb_indices(x, cols[shape_key], points).tolist()
+        x = x[idx]
+        cols = {k: [v[i] for i in idx] for k, v in cols.items()}
+    return {"dates": iso_dates(x), **cols}
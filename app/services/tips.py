@@ -1,66 +1,150 @@
+from typing import List, Optional, Tuple
+import asyncio
+import hashlib
+import logging
 import random
 import re
+import threading
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+from app.core.config import TIPS_POOL_MAX
+from app.core.db import engine
+from app.core.http_client import http_get
+from app.models import Tip, Translation
 
-def fetch_health_fact() -> str:
-    import requests
+logger = logging.getLogger(__name__)
+
+SOURCES = [
+    "https://www.who.int/news-room/fact-sheets/detail/healthy-diet",
+    "https://www.nhs.uk/live-well/eat-well/",
+    "https://www.cdc.gov/healthyweight/healthy_eating/index.html",
+    "https://www.hsph.harvard.edu/nutritionsource/healthy-eating-plate/",
+    "https://www.who.int/news-room/articles-detail/healthy-diet",
+]
+
+FALLBACK_TIPS = [
+    "Jedz dużo warzyw, owoców i pełnoziarnistych produktów.",
+    "Wybieraj chude źródła białka i zdrowe tłuszcze.",
+    "Ogranicz cukry dodane i wysoko przetworzone produkty.",
+    "Pij wodę i jedz regularnie, dbając o porcje.",
+    "Włącz do diety strączki, orzechy i nasiona.",
+    "Zmniejsz spożycie soli; zamieniaj ją na zioła i przyprawy.",
+    "Wybieraj produkty z wysoką zawartością błonnika.",
+]
+
+_KEYWORDS = [
+    "diet", "healthy", "vegetable", "fruit", "whole", "grain", "fiber", "salt", "sugar",
+    "protein", "fat", "water", "hydrate", "portion", "calorie", "nuts", "seeds", "legumes",
+]
+
+def _is_tip(s: str) -> bool:
+    if not s or len(s) < 60 or len(s) > 240:
+        return False
+    wc = len(s.split())
+    if wc < 12 or wc > 40:
+        return False
+    if ":" in s or "•" in s or "|" in s:
+        return False
+    if not s[-1] in ".!?":
+        return False
+    sl = s.lower()
+    return any(k in sl for k in _KEYWORDS)
+
+def _page_tips(url: str) -> List[str]:
     from bs4 import BeautifulSoup
-    sources = [
-        "https://www.who.int/news-room/fact-sheets/detail/healthy-diet",
-        "https://www.nhs.uk/live-well/eat-well/",
-        "https://www.cdc.gov/healthyweight/healthy_eating/index.html",
-        "https://www.hsph.harvard.edu/nutritionsource/healthy-eating-plate/",
-        "https://www.who.int/news-room/articles-detail/healthy-diet",
-    ]
+    r = http_get(url, timeout=8)
+    soup = BeautifulSoup(r.text, "html.parser")
     tips = []
-    for url in sources:
-        try:
-            r = requests.get(url, timeout=8, headers={"User-Agent": "WeightTracker/1.0"})
-            html = r.text
-            soup = BeautifulSoup(html, "html.parser")
-            items = [el.get_text(" ", strip=True) for el in soup.select("p, li")]
-            for t in items:
-                t = re.sub(r"\s+", " ", t)
-                if len(t) < 40:
-                    continue
-                sentences = re.split(r"(?<=[.!?])\s+", t)
-                for s in sentences:
-                    s = s.strip()
-                    if not s or len(s) < 60 or len(s) > 240:
-                        continue
-                    wc = len(s.split())
-                    if wc < 12 or wc > 40:
-                        continue
-                    if ":" in s or "•" in s or "|" in s:
-                        continue
-                    if not s[-1] in ".!?":
-                        continue
-                    sl = s.lower()
-                    kw = [
-                        "diet","healthy","vegetable","fruit","whole","grain","fiber","salt","sugar",
-                        "protein","fat","water","hydrate","portion","calorie","nuts","seeds","legumes"
-                    ]
-                    if not any(k in sl for k in kw):
-                        continue
-                    tips.append(s)
-            if tips:
-                break
-        except Exception:
+    for el in soup.select("p, li"):
+        t = re.sub(r"\s+", " ", el.get_text(" ", strip=True))
+        if len(t) < 40:
             continue
-    if not tips:
-        tips = [
-            "Jedz dużo warzyw, owoców i pełnoziarnistych produktów.",
-            "Wybieraj chude źródła białka i zdrowe tłuszcze.",
-            "Ogranicz cukry dodane i wysoko przetworzone produkty.",
-            "Pij wodę i jedz regularnie, dbając o porcje.",
-            "Włącz do diety strączki, orzechy i nasiona.",
-            "Zmniejsz spożycie soli; zamieniaj ją na zioła i przyprawy.",
-            "Wybieraj produkty z wysoką zawartością błonnika.",
-        ]
-    return random.choice(tips)
+        tips.extend(s for s in (s.strip() for s in re.split(r"(?<=[.!?])\s+", t)) if _is_tip(s))
+    return tips
+
+def harvest_tips() -> List[Tuple[str, str]]:
+    """(sentence, source url) pairs from every source that could be fetched."""
+    found = []
+    for url in SOURCES:
+        try:
+            found.extend((t, url) for t in _page_tips(url))
+        except Exception as e:
+            logger.warning("Could not harvest tips from %s: %s", url, e)
+    return found
 
-def translate_to_pl(text: str) -> str:
+def translate_to_pl(text: str) -> Optional[str]:
+    """Polish translation, cached by a hash of the source text; None if translation fails (not cached)."""
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with Session(engine) as session:
+        cached = session.get(Translation, (key, "pl"))
+        if cached is not None:
+            return cached.translated
     try:
         from deep_translator import GoogleTranslator
-        return GoogleTranslator(source="auto", target="pl").translate(text)
-    except Exception:
-        return text
+        translated = GoogleTranslator(source="auto", target="pl").translate(text)
+    except Exception as e:
+        logger.warning("Could not translate tip: %s", e)
+        return None
+    if not translated:
+        return None
+    with Session(engine) as session:
+        session.merge(Translation(source_hash=key, target="pl", translated=translated))
+        session.commit()
+    return translated
+
+_pool: List[str] = []
+_pool_loaded = False
+_pool_lock = threading.Lock()
+
+def load_tip_pool() -> None:
+    global _pool, _pool_loaded
+    with Session(engine) as session:
+        texts = session.exec(select(Tip.text_pl)).all()
+    with _pool_lock:
+        _pool, _pool_loaded = list(texts), True
+
+def random_tip() -> str:
+    """A tip from the in-memory pool, never touching the network."""
+    if not _pool_loaded:
+        load_tip_pool()
+    pool = _pool
+    return random.choice(pool or FALLBACK_TIPS)
+
+def refresh_tip_pool() -> int:
+    """Harvest, translate and store tips not seen before; returns how many were added."""
+    harvested = harvest_tips()
+    with Session(engine) as session:
+        # Earlier versions stored the English text when translation failed; retry those.
+        session.exec(delete(Tip).where(Tip.text_pl == Tip.text))
+        session.commit()
+        known = set(session.exec(select(Tip.text)).all())
+    added = 0
+    for text, url in dict(harvested).items():
+        if text in known:
+            continue
+        text_pl = translate_to_pl(text)
+        if text_pl is None:
+            # Left out of the pool for now; the next harvest tries it again.
+            continue
+        with Session(engine) as session:
+            session.add(Tip(text=text, text_pl=text_pl, source=url))
+            session.commit()
+        known.add(text)
+        added += 1
+    with Session(engine) as session:
+        excess = session.exec(select(func.count(Tip.id))).one() - TIPS_POOL_MAX
+        if excess > 0:
+            oldest = select(Tip.id).order_by(Tip.harvested_at).limit(excess)
+            session.exec(delete(Tip).where(Tip.id.in_(oldest.scalar_subquery())).execution_options(synchronize_session=False))
+            session.commit()
+    load_tip_pool()
+    return added
+
+async def tip_refresh_loop(interval: int):
+    while True:
+        try:
+            added = await asyncio.to_thread(refresh_tip_pool)
+            logger.info("Tip pool refreshed, %d new tips", added)
+        except Exception:
+            logger.exception("Tip pool refresh failed")
+        await asyncio.sleep(interval)
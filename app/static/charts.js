@@ -0,0 +1,127 @@
+// Minimal canvas charts fed by /api/series/* (CHART_MODE=client).
+// <canvas class="js-chart" data-src="/api/series/weight?points=800" data-kind="line|hist"
+//         data-y="weights" data-y2="trend" data-title="..." data-xlabel="..." data-ylabel="...">
+(function () {
+  "use strict";
+
+  var PAD = { left: 64, right: 16, top: 40, bottom: 48 };
+
+  function niceTicks(min, max, count) {
+    if (min === max) { min -= 1; max += 1; }
+    var step = Math.pow(10, Math.floor(Math.log10((max - min) / count)));
+    var err = (max - min) / count / step;
+    if (err >= 7.5) step *= 10; else if (err >= 3.5) step *= 5; else if (err >= 1.5) step *= 2;
+    var ticks = [];
+    for (var v = Math.ceil(min / step) * step; v <= max + step / 2; v += step) ticks.push(+v.toFixed(10));
+    return ticks;
+  }
+
+  function frame(ctx, w, h, opts, xr, yr) {
+    ctx.fillStyle = "#fff";
+    ctx.fillRect(0, 0, w, h);
+    ctx.fillStyle = "#111";
+    ctx.font = "bold 18px system-ui, sans-serif";
+    ctx.textAlign = "center";
+    ctx.fillText(opts.title || "", w / 2, 24);
+    ctx.font = "13px system-ui, sans-serif";
+    ctx.fillText(opts.xlabel || "", w / 2, h - 8);
+    ctx.save();
+    ctx.translate(14, h / 2);
+    ctx.rotate(-Math.PI / 2);
+    ctx.fillText(opts.ylabel || "", 0, 0);
+    ctx.restore();
+    ctx.strokeStyle = "#ddd";
+    ctx.fillStyle = "#333";
+    ctx.font = "11px system-ui, sans-serif";
+    niceTicks(yr[0], yr[1], 6).forEach(function (t) {
+      var y = sy(t, yr, h);
+      ctx.beginPath(); ctx.moveTo(PAD.left, y); ctx.lineTo(w - PAD.right, y); ctx.stroke();
+      ctx.textAlign = "right"; ctx.fillText(String(t), PAD.left - 6, y + 4);
+    });
+    ctx.textAlign = "center";
+    (opts.xticks || niceTicks(xr[0], xr[1], 6)).forEach(function (t) {
+      var x = sx(t, xr, w);
+      ctx.beginPath(); ctx.moveTo(x, PAD.top); ctx.lineTo(x, h - PAD.bottom); ctx.stroke();
+      ctx.fillText(opts.xfmt ? opts.xfmt(t) : String(t), x, h - PAD.bottom + 16);
+    });
+  }
+
+  function sx(v, r, w) { return PAD.left + (v - r[0]) / (r[1] - r[0] || 1) * (w - PAD.left - PAD.right); }
+  function sy(v, r, h) { return h - PAD.bottom - (v - r[0]) / (r[1] - r[0] || 1) * (h - PAD.top - PAD.bottom); }
+
+  function range(values) {
+    var lo = Infinity, hi = -Infinity;
+    values.forEach(function (v) { if (v !== null) { if (v < lo) lo = v; if (v > hi) hi = v; } });
+    if (lo === hi) { lo -= 1; hi += 1; }
+    var pad = (hi - lo) * 0.05;
+    return [lo - pad, hi + pad];
+  }
+
+  function empty(ctx, w, h, text) {
+    ctx.fillStyle = "#fff"; ctx.fillRect(0, 0, w, h);
+    ctx.fillStyle = "#111"; ctx.font = "24px system-ui, sans-serif"; ctx.textAlign = "center";
+    ctx.fillText(text, w / 2, h / 2);
+  }
+
+  function drawLine(ctx, w, h, data, opts) {
+    var ys = data[opts.y];
+    if (!ys.length) return empty(ctx, w, h, "Brak danych");
+    var xs = data.dates.map(function (d) { return Date.parse(d); });
+    var xr = [xs[0], xs[xs.length - 1]];
+    if (xr[0] === xr[1]) xr = [xr[0] - 864e5, xr[1] + 864e5];
+    var yr = range(ys.concat(opts.y2 && data[opts.y2] ? data[opts.y2] : []));
+    opts.xticks = [0, 1, 2, 3, 4, 5].map(function (i) { return xr[0] + (xr[1] - xr[0]) * i / 5; });
+    opts.xfmt = function (t) { return new Date(t).toISOString().slice(0, 10); };
+    frame(ctx, w, h, opts, xr, yr);
+    function series(values, color, width, dots) {
+      ctx.strokeStyle = color; ctx.fillStyle = color; ctx.lineWidth = width;
+      ctx.beginPath();
+      var pen = false;
+      values.forEach(function (v, i) {
+        if (v === null) { pen = false; return; }
+        var x = sx(xs[i], xr, w), y = sy(v, yr, h);
+        if (pen) ctx.lineTo(x, y); else ctx.moveTo(x, y);
+        pen = true;
+      });
+      ctx.stroke();
+      if (dots && values.length <= 400) values.forEach(function (v, i) {
+        if (v === null) return;
+        ctx.beginPath(); ctx.arc(sx(xs[i], xr, w), sy(v, yr, h), 3, 0, 2 * Math.PI); ctx.fill();
+      });
+      ctx.lineWidth = 1;
+    }
+    series(ys, "#1f77b4", 2, true);
+    if (opts.y2 && data[opts.y2]) series(data[opts.y2], "orange", 3, false);
+  }
+
+  function drawHist(ctx, w, h, data, opts) {
+    var ys = data[opts.y];
+    if (!ys.length) return empty(ctx, w, h, "Brak danych do histogramu");
+    var bins = opts.bins || 16;
+    var lo = Math.min.apply(null, ys), hi = Math.max.apply(null, ys);
+    if (lo === hi) { lo -= 0.5; hi += 0.5; }
+    var width = (hi - lo) / bins, counts = new Array(bins).fill(0);
+    ys.forEach(function (v) { counts[Math.min(bins - 1, Math.floor((v - lo) / width))]++; });
+    var xr = [lo, hi], yr = [0, Math.max.apply(null, counts) * 1.05];
+    frame(ctx, w, h, opts, xr, yr);
+    ctx.fillStyle = "#1f77b4"; ctx.strokeStyle = "#000";
+    counts.forEach(function (c, i) {
+      var x0 = sx(lo + i * width, xr, w), x1 = sx(lo + (i + 1) * width, xr, w), y = sy(c, yr, h);
+      ctx.fillRect(x0, y, x1 - x0, h - PAD.bottom - y);
+      ctx.strokeRect(x0, y, x1 - x0, h - PAD.bottom - y);
+    });
+  }
+
+  function render(canvas) {
+    var ds = canvas.dataset;
+    var opts = { y: ds.y, y2: ds.y2, title: ds.title, xlabel: ds.xlabel, ylabel: ds.ylabel, bins: +ds.bins || 16 };
+    fetch(ds.src, { credentials: "same-origin" })
+      .then(function (r) { return r.json(); })
+      .then(function (data) {
+        var ctx = canvas.getContext("2d");
+        (ds.kind === "hist" ? drawHist : drawLine)(ctx, canvas.width, canvas.height, data, opts);
+      });
+  }
+
+  document.querySelectorAll("canvas.js-chart").forEach(render);
+})();
@@ -0,0 +1,39 @@
+// Meal name autocomplete on /meals from /api/meals/suggest; picking a name fills in its last kcal.
+(function () {
+  "use strict";
+
+  var form = document.querySelector("form.js-meal-add");
+  if (!form) return;
+  var name = form.querySelector("input[name=name]");
+  var kcal = form.querySelector("input[name=kcal]");
+  var list = document.getElementById(name.getAttribute("list"));
+  var known = {}, timer = null, seq = 0;
+
+  function refresh() {
+    var q = name.value.trim(), mine = ++seq;
+    if (!q) { list.innerHTML = ""; return; }
+    fetch("/api/meals/suggest?q=" + encodeURIComponent(q), { credentials: "same-origin" })
+      .then(function (r) { return r.json(); })
+      .then(function (data) {
+        if (mine !== seq) return;
+        known = {};
+        list.innerHTML = "";
+        data.suggestions.forEach(function (s) {
+          known[s.name] = s.kcal;
+          var opt = document.createElement("option");
+          opt.value = s.name;
+          opt.label = s.kcal + " kcal";
+          list.appendChild(opt);
+        });
+      });
+  }
+
+  name.addEventListener("input", function () {
+    if (known.hasOwnProperty(name.value)) {
+      kcal.value = known[name.value];
+      return;
+    }
+    clearTimeout(timer);
+    timer = setTimeout(refresh, 120);
+  });
+})();
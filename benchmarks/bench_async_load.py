@@ -0,0 +1,132 @@
+"""/meals latency on its own and while 50 /recipes searches are in flight.
+
+Runs the app under uvicorn against a local stand-in for the search engine and
+recipe pages, each page answering after a delay, so the recipe searches spend
+their time waiting on the network the way they do in production.
+
+Run from the repository root:  python -m benchmarks.bench_async_load [recipes] [page_delay_s]
+"""
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import uvicorn
+
+PAGE_DELAY = 0.5
+
+class _Upstream(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        port = self.server.server_port
+        if self.path.startswith("/ddg"):
+            body = "".join(
+                f'<a class="result__a" href="http://127.0.0.1:{port}/page/{i}">r</a>' for i in range(20)
+            ).encode()
+        elif self.path.startswith("/off"):
+            body = b'{"products": []}'
+        else:
+            time.sleep(PAGE_DELAY)
+            body = b"<title>Przepis</title><p>Nic, czego szukasz.</p>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass  # the app gave up on this page after finding enough or hitting its deadline
+
+    def log_message(self, *args):
+        pass
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def _timed_get(client, url: str) -> float:
+    t0 = time.perf_counter()
+    r = await client.get(url)
+    r.raise_for_status()
+    return (time.perf_counter() - t0) * 1000
+
+async def _probe(client, stop: asyncio.Event, interval: float = 0.05) -> list:
+    samples = []
+    while not stop.is_set():
+        samples.append(await _timed_get(client, "/meals"))
+        await asyncio.sleep(interval)
+    return samples
+
+def _summary(samples: list) -> str:
+    q = statistics.quantiles(samples, n=20)
+    return f"n={len(samples):<4} p50={statistics.median(samples):7.2f} ms  p95={q[18]:7.2f} ms  max={max(samples):7.2f} ms"
+
+async def run(base: str, recipes: int):
+    async with httpx.AsyncClient(base_url=base, timeout=120) as client:
+        await client.post("/register", data={"email": "bench@example.com", "password": "bench"})
+        for i in range(20):
+            await client.post("/meals/add", data={"name": f"posiłek {i}", "kcal": "300"})
+
+        idle = [await _timed_get(client, "/meals") for _ in range(100)]
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, stop))
+        t0 = time.perf_counter()
+        # Distinct ingredients, so no search is answered from the local corpus.
+        searches = [
+            client.post("/recipes", data={"ingredients": f"składnik{i}", "count": "5"}) for i in range(recipes)
+        ]
+        await asyncio.gather(*searches)
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        loaded = await probe
+
+    print(f"/meals idle:                     {_summary(idle)}")
+    print(f"/meals with {recipes} /recipes in flight: {_summary(loaded)}")
+    print(f"{recipes} /recipes searches finished in {elapsed:.1f} s")
+
+def main(recipes: int = 50, page_delay: float = 0.5):
+    global PAGE_DELAY
+    PAGE_DELAY = page_delay
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), _Upstream)
+    upstream.daemon_threads = True
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    up = f"http://127.0.0.1:{upstream.server_port}"
+    os.environ.setdefault("DUCKDUCKGO_HTML_URL", f"{up}/ddg")
+    os.environ.setdefault("OPENFOODFACTS_SEARCH_URL", f"{up}/off")
+    os.environ.setdefault("RECIPES_DEADLINE", "8")
+    os.environ.setdefault("TIPS_REFRESH_INTERVAL", "0")
+    os.environ.setdefault("SQLITE_MAINTENANCE_INTERVAL", "0")
+
+    # The app keeps its database under ./data and serves ./app/static.
+    repo = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.symlink(os.path.join(repo, "app"), os.path.join(tmp, "app"))
+        os.chdir(tmp)
+        try:
+            from app.main import app
+            port = _free_port()
+            server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+            thread = threading.Thread(target=server.run, daemon=True)
+            thread.start()
+            while not server.started:
+                time.sleep(0.05)
+            asyncio.run(run(f"http://127.0.0.1:{port}", recipes))
+            server.should_exit = True
+            thread.join()
+        finally:
+            os.chdir(repo)
+            upstream.shutdown()
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.5,
+    )
@@ -0,0 +1,53 @@
+"""Import time of app.main, for watching cold-start cost.
+
+Run from the repository root:  python -m benchmarks.bench_import_time
+
+Imports app.main under `python -X importtime` in fresh interpreters and prints
+the best run with its slowest direct imports. The time is informational, it
+varies too much between machines to gate on; the check that heavy modules stay
+out of the import is tests/test_import_time.py. This script still exits
+non-zero if one of LAZY_MODULES got loaded.
+"""
+import subprocess
+import sys
+
+RUNS = 5
+# Loaded on first use (charts, scraping, translation, exports), never by importing the app.
+# numpy is exempt: the dashboard (/) and /stats compute weekly changes with it on every
+# request, so a lazy import would only move its cost into the first page a user opens.
+LAZY_MODULES = ("matplotlib", "pandas", "bs4", "requests", "httpx", "deep_translator", "lxml", "pyarrow")
+
+def import_profile() -> tuple:
+    """(cumulative µs of app.main, {direct import: cumulative µs}, lazy modules that got loaded)."""
+    probe = f"import sys, app.main; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True, text=True, check=True,
+    )
+    total, children = 0, {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        level = (len(name) - len(name.lstrip())) // 2
+        if name.strip() == "app.main":
+            total = int(cumulative)
+        elif level == 1:
+            children[name.strip()] = int(cumulative)
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total, children, loaded
+
+def main():
+    runs = [import_profile() for _ in range(RUNS)]
+    total, children, loaded = min(runs, key=lambda r: r[0])
+    print(f"import app.main: best {total / 1000:.0f} ms of {RUNS} runs")
+    for name, us in sorted(children.items(), key=lambda kv: -kv[1])[:10]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    if loaded:
+        print("FAIL: imported eagerly:", ", ".join(loaded))
+    sys.exit(1 if loaded else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Per-request query latency with and without the (user_id, date) indexes.
+
+Run from the repository root:  python -m benchmarks.bench_indexes [users]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from sqlmodel import SQLModel, create_engine
+from app import models
+
+QUERIES = {
+    "get_all_measurements": ("SELECT id, date, weight_kg, user_id FROM measurement WHERE user_id = ? ORDER BY date", lambda uid, d: (uid,)),
+    "meals_today": ("SELECT id, date, name, kcal, user_id FROM meal WHERE user_id = ? AND date = ? ORDER BY id", lambda uid, d: (uid, d)),
+    "saved_day_lookup": ("SELECT id FROM savedday WHERE user_id = ? AND date = ?", lambda uid, d: (uid, d)),
+    "meal_history_days": ("SELECT DISTINCT date FROM savedday WHERE user_id = ? ORDER BY date DESC", lambda uid, d: (uid,)),
+    "login_by_email": ("SELECT id FROM user WHERE email = ?", lambda uid, d: (f"user{uid}@example.com",)),
+}
+INDEXES = ["ix_measurement_user_date", "ix_meal_user_date", "ux_savedday_user_date", "ux_user_email"]
+
+def build(path: str, users: int, days: int = 60, seed: int = 42):
+    SQLModel.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    rnd = random.Random(seed)
+    start = date(2024, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO user (id, email, password_hash, created_at, daily_kcal_goal) VALUES (?, ?, 'x', '2024-01-01', 2000)",
+        ((u, f"user{u}@example.com") for u in range(1, users + 1)),
+    )
+    # Interleave users day by day, the way rows land in production.
+    for i in range(days):
+        d = (start + timedelta(days=i)).isoformat()
+        conn.executemany("INSERT INTO measurement (date, weight_kg, user_id) VALUES (?, ?, ?)",
+                         ((d, round(rnd.uniform(60, 100), 1), u) for u in range(1, users + 1)))
+        conn.executemany("INSERT INTO meal (date, name, kcal, user_id) VALUES (?, 'kanapka', ?, ?)",
+                         ((d, rnd.randint(100, 900), u) for u in range(1, users + 1)))
+        conn.executemany("INSERT INTO savedday (date, user_id, total_kcal, saved_at) VALUES (?, ?, 0, '2024-01-01')",
+                         ((d, u) for u in range(1, users + 1)))
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+def measure(conn, users: int, days: int, rounds: int = 200, seed: int = 7) -> dict:
+    rnd = random.Random(seed)
+    start = date(2024, 1, 1)
+    out = {}
+    for name, (sql, params) in QUERIES.items():
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            uid = rnd.randint(1, users)
+            d = (start + timedelta(days=rnd.randrange(days))).isoformat()
+            conn.execute(sql, params(uid, d)).fetchall()
+        out[name] = (time.perf_counter() - t0) / rounds * 1000
+    return out
+
+def main(users: int = 10_000, days: int = 60):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        conn = build(path, users, days)
+        after = measure(conn, users, days)
+        for ix in INDEXES:
+            conn.execute(f"DROP INDEX {ix}")
+        before = measure(conn, users, days, rounds=20)
+        conn.close()
+    finally:
+        os.remove(path)
+    print(f"{users} users x {days} days, mean ms per query")
+    print(f"{'query':<24}{'no index':>12}{'indexed':>12}")
+    for name in QUERIES:
+        print(f"{name:<24}{before[name]:>12.3f}{after[name]:>12.3f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
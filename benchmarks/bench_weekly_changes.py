@@ -0,0 +1,62 @@
+"""compute_weekly_changes: the former pandas path vs the NumPy engine.
+
+Run from the repository root:  python -m benchmarks.bench_weekly_changes
+"""
+import time
+from array import array
+from datetime import date
+import numpy as np
+import pandas as pd
+from app.services.measurements import MeasurementSeries, weekly_changes
+
+def pandas_weekly_changes(measurements):
+    # The implementation this module replaced, kept for comparison.
+    if not measurements or len(measurements) < 2:
+        return []
+    df = pd.DataFrame([{"date": m.date, "weight": m.weight_kg} for m in measurements])
+    df = df.sort_values("date")
+    df["date"] = pd.to_datetime(df["date"])
+    df["delta_days"] = df["date"].diff().dt.days
+    df["delta_weight"] = df["weight"].diff()
+    df = df.dropna()
+    df = df[df["delta_days"] > 0]
+    df["kg_per_week"] = df["delta_weight"] / df["delta_days"] * 7
+    weekly = df[["date", "kg_per_week"]].copy()
+    weekly["kg_per_week"] = weekly["kg_per_week"].round(3)
+    return weekly.to_dict(orient="records")
+
+def make_series(n: int, seed: int = 0) -> MeasurementSeries:
+    rng = np.random.default_rng(seed)
+    if n <= 50_000:
+        start, gaps = date(2000, 1, 1).toordinal(), rng.integers(1, 4, n)
+    else:
+        # Several weigh-ins per day, or 1M points run past pandas' Timestamp range.
+        start, gaps = date(1680, 1, 1).toordinal(), rng.choice([0, 1], n, p=[0.8, 0.2])
+    dates = start + np.cumsum(gaps)
+    weights = np.round(80 + np.cumsum(rng.normal(0, 0.2, n)), 1)
+    return MeasurementSeries(array("q", range(n)), array("l", dates.tolist()), array("d", weights.tolist()))
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def main():
+    print(f"{'points':>10}{'pandas ms':>14}{'numpy ms':>12}{'speedup':>10}")
+    for n, repeat in ((100, 200), (10_000, 20), (1_000_000, 3)):
+        series = make_series(n)
+        rows = series.rows()
+        if n <= 50_000:
+            # pandas' default sort is unstable, so only tie-free series compare exactly.
+            expected = pandas_weekly_changes(rows)
+            got = weekly_changes(series.dates, series.weights)
+            assert np.allclose([r["kg_per_week"] for r in expected], got.kg_per_week)
+        t_pd = best_of(lambda: pandas_weekly_changes(rows), repeat)
+        t_np = best_of(lambda: weekly_changes(series.dates, series.weights), repeat)
+        print(f"{n:>10}{t_pd:>14.3f}{t_np:>12.3f}{t_pd / t_np:>9.0f}x")
+
+if __name__ == "__main__":
+    main()
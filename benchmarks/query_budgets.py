@@ -0,0 +1,82 @@
+"""SQL statements per page, checked against a budget per route.
+
+Run from the repository root:  python -m benchmarks.query_budgets [users] [years]
+
+Logs in as a synthetic user (benchmarks.synthetic), requests each page under
+app.core.profiler.max_queries and exits non-zero if any of them runs more
+statements than its budget, or repeats one statement shape often enough to
+look like an N+1.
+"""
+import os
+import sys
+import tempfile
+
+# (path, budget): what each page needs with cold caches (reset before every path), so any
+# extra query per page fails here.
+BUDGETS = [
+    ("/", 1),
+    ("/history", 2),
+    ("/history?filters=2024Q1,2023", 2),
+    ("/history?before=2024-06-30_1000000&shown=100", 2),
+    ("/stats", 1),
+    ("/meals", 2),
+    ("/meals/history", 4),
+    ("/meals/history?from_date=2024-01-01&product=zupa", 4),
+    ("/meals/history?before=2024-06-30_1000000", 4),
+    ("/api/series/weight", 1),
+    ("/api/series/meals-daily", 1),
+    ("/api/series/meals-periods?period=week", 1),
+    ("/api/meals/suggest?q=zu", 1),
+    ("/plot", 1),
+    ("/plot-meals-daily", 1),
+]
+
+def main(users: int, years: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before app.core is imported.
+        os.environ["DB_PATH"] = os.path.join(tmp, "budget.db")
+        os.environ.setdefault("PLOT_WORKERS", "0")
+        os.environ.setdefault("TIPS_REFRESH_INTERVAL", "0")
+        os.environ.setdefault("SQLITE_MAINTENANCE_INTERVAL", "0")
+        from fastapi.testclient import TestClient
+        from benchmarks.synthetic import generate
+        from app.core.db import engine
+        from app.core.profiler import QueryBudgetExceeded, max_queries
+        from app.core.security import hash_password
+        from app.main import app
+        from app.services.measurements import invalidate_measurements
+        from app.services.plotting import clear_png_cache
+
+        generate(users, years)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("UPDATE user SET password_hash = ? WHERE id = 1", (hash_password("bench"),))
+
+        failures = []
+        with TestClient(app) as client:
+            client.post("/login", data={"email": "user1@example.com", "password": "bench"})
+            for path, budget in BUDGETS:
+                # Logging in follows the redirect to / and fills these; each path pays its own misses.
+                invalidate_measurements(1)
+                clear_png_cache()
+                try:
+                    with max_queries(budget) as log:
+                        r = client.get(path)
+                    r.raise_for_status()
+                except QueryBudgetExceeded as e:
+                    log = e.log
+                    failures.append(f"{path}: {e}")
+                suspects = log.repeated()
+                if suspects:
+                    failures.append(f"{path}: possible N+1: " + "; ".join(f"{n}x {shape}" for shape, n in suspects))
+                print(f"{path:<50}{len(log):>4} / {budget:<4}{log.seconds * 1000:8.2f} ms")
+        engine.dispose()
+
+    for f in failures:
+        print("FAIL:", f)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 3,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2,
+    )
@@ -0,0 +1,186 @@
+"""Service-layer micro-benchmarks on a synthetic database, with JSON results.
+
+Run from the repository root:
+
+    python -m benchmarks.suite [--users 20] [--years 3] [--out FILE] [--compare OLD.json]
+
+Builds a temporary database with benchmarks.synthetic, times each hot path
+and writes {"meta": ..., "results": {name: {"min_ms", "median_ms", ...}}} to
+--out (default benchmarks/results/<commit>.json). --compare prints the
+median of every benchmark against an earlier results file.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+def _timings(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], object]] = None) -> List[float]:
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return runs
+
+def _summary(runs: List[float]) -> Dict[str, float]:
+    return {
+        "min_ms": round(min(runs), 4),
+        "median_ms": round(statistics.median(runs), 4),
+        "mean_ms": round(statistics.fmean(runs), 4),
+        "runs": len(runs),
+    }
+
+def _commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", "app"], capture_output=True).returncode != 0
+        return out + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _import_csv(users: int, years: int) -> bytes:
+    # One weigh-in a day over the same span the synthetic users cover, in the /import format.
+    start = date(2024, 12, 31).toordinal() - 365 * years + 1
+    lines = (f"{d.day:02d}/{d.month:02d}/{d.year},{70 + (i % 300) / 10:.1f}\n"
+             for i, d in enumerate(date.fromordinal(o) for o in range(start, start + 365 * years)))
+    return "".join(lines).encode("utf-8")
+
+def run_benchmarks(users: int, years: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    from app.services import charts
+    from app.services.import_export import export_chunks, import_measurements_csv
+    from app.core.pagination import decode_cursor
+    from app.services.meals import get_daily_kcal_totals, get_meal_history, get_meal_history_page
+    from app.services.measurements import (
+        compile_periods, compute_weekly_changes, filter_by_periods, get_all_measurements,
+        get_measurement_page, get_measurement_series, invalidate_measurements,
+    )
+    from app.services.plotting import render_png
+
+    uid = users // 2 or 1
+    last_year = 2024
+    filters = f"{last_year}Q1,{last_year}H2,{last_year - 1}"
+    # Unknown tokens are dropped silently, which would leave these cases timing a smaller filter.
+    bad = [t for t in filters.split(",") if not compile_periods(t)]
+    if bad:
+        raise SystemExit(f"period filter tokens not accepted by compile_periods: {bad}")
+    series = get_measurement_series(uid)
+    weekly = compute_weekly_changes(series)
+    totals = get_daily_kcal_totals(uid)
+    rows = get_all_measurements(uid)
+    csv_data = _import_csv(users, years)
+    # A cursor from the oldest year, so the "deep" pages skip most of the history.
+    deep = decode_cursor(f"{last_year - years + 1}-06-30_{2 ** 62}")
+
+    cases = {
+        "get_all_measurements": (lambda: get_all_measurements(uid), None),
+        "measurement_series_cold": (lambda: get_measurement_series(uid), lambda: invalidate_measurements(uid)),
+        "measurement_series_cached": (lambda: get_measurement_series(uid), None),
+        "compute_weekly_changes": (lambda: compute_weekly_changes(series), None),
+        "filter_by_periods_series": (lambda: filter_by_periods(series, filters), None),
+        "filter_by_periods_rows": (lambda: filter_by_periods(rows, filters), None),
+        "meal_history": (lambda: get_meal_history(uid), None),
+        "meal_history_last_year": (lambda: get_meal_history(uid, d_from=date(last_year, 1, 1)), None),
+        "meal_history_product": (lambda: get_meal_history(uid, product="zupa"), None),
+        "measurement_page_first": (lambda: get_measurement_page(uid), None),
+        "measurement_page_deep": (lambda: get_measurement_page(uid, before=deep), None),
+        "meal_history_page_first": (lambda: get_meal_history_page(uid), None),
+        "meal_history_page_deep": (lambda: get_meal_history_page(uid, before=deep), None),
+        "daily_kcal_totals": (lambda: get_daily_kcal_totals(uid), None),
+        "render_png_plot": (lambda: render_png(charts.weight_history, series.dates, series.weights, True), None),
+        "render_png_plot_weekly_changes": (
+            lambda: render_png(charts.histogram, weekly.kg_per_week, "Histogram tygodniowych zmian masy", "Zmiana masy (kg/tydzień)", "Liczba tygodni"),
+            None,
+        ),
+        "render_png_plot_meals_daily": (
+            lambda: render_png(charts.daily_kcal, [d.toordinal() for d, _ in totals], [t for _, t in totals]), None,
+        ),
+        "render_png_plot_meals_hist": (
+            lambda: render_png(charts.histogram, [t for _, t in totals], "Histogram dziennych kalorii", "Kalorie (kcal)", "Liczba dni"),
+            None,
+        ),
+        # Every run after the first updates the same dates, the steady state of re-importing a file.
+        "import_measurements_csv": (lambda: import_measurements_csv(users + 1, io.BytesIO(csv_data)), None),
+        "export_measurements_csv": (lambda: sum(map(len, export_chunks("measurements", "csv", uid))), None),
+        "export_meals_csv": (lambda: sum(map(len, export_chunks("meals", "csv", uid))), None),
+        "export_meals_ndjson": (lambda: sum(map(len, export_chunks("meals", "ndjson", uid))), None),
+    }
+    render_png(charts.warm_up)
+    results = {}
+    for name, (fn, setup) in cases.items():
+        fn()  # warm-up, not timed
+        n = max(3, repeat // 5) if name.startswith(("render_png", "import_", "export_")) else repeat
+        results[name] = _summary(_timings(fn, n, setup))
+        print(f"{name:<34}{results[name]['median_ms']:>12.3f} ms  (min {results[name]['min_ms']:.3f}, n={n})")
+    return results
+
+def compare(old: dict, new: dict) -> None:
+    keys = ("users", "years", "seed")
+    if any(old["meta"].get(k) != new["meta"][k] for k in keys):
+        print("\nnote: the runs used different data sizes:",
+              ", ".join(f"{k} {old['meta'].get(k)} -> {new['meta'][k]}" for k in keys))
+    print(f"\n{'benchmark':<34}{'old ms':>12}{'new ms':>12}{'change':>10}")
+    for name, r in new["results"].items():
+        prev = old["results"].get(name)
+        if prev is None:
+            print(f"{name:<34}{'-':>12}{r['median_ms']:>12.3f}{'new':>10}")
+            continue
+        change = (r["median_ms"] / prev["median_ms"] - 1) * 100 if prev["median_ms"] else 0.0
+        print(f"{name:<34}{prev['median_ms']:>12.3f}{r['median_ms']:>12.3f}{change:>+9.1f}%")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=25)
+    parser.add_argument("--out")
+    parser.add_argument("--compare")
+    args = parser.parse_args(argv)
+
+    commit = _commit()
+    out = args.out or os.path.join("benchmarks", "results", f"{commit}.json")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before app.core is imported.
+        os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+        os.environ.setdefault("PLOT_WORKERS", "0")
+        from benchmarks.synthetic import generate
+        t0 = time.perf_counter()
+        counts = generate(args.users, args.years, args.seed)
+        print(f"generated {counts} in {time.perf_counter() - t0:.1f} s")
+        results = run_benchmarks(args.users, args.years, args.repeat)
+        from app.core.db import engine
+        engine.dispose()
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "years": args.years,
+            "seed": args.seed,
+            "rows": counts,
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"results written to {out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,74 @@
+"""Deterministic synthetic data for the benchmarks.
+
+Fills the database app.core.db points at (set DB_PATH before importing app)
+with N users x M years of measurements, meals and saved days. The same
+arguments always produce the same rows.
+
+    DB_PATH=/tmp/bench.db python -m benchmarks.synthetic [users] [years]
+"""
+import random
+import sys
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+END = date(2024, 12, 31)
+MEAL_NAMES = [
+    "owsianka", "jajecznica", "kanapka z serem", "jogurt naturalny", "jabłko", "banan",
+    "zupa pomidorowa", "rosół", "pierogi ruskie", "schabowy z ziemniakami", "kurczak z ryżem",
+    "sałatka grecka", "makaron bolognese", "łosoś z warzywami", "twarożek", "orzechy włoskie",
+    "pizza margherita", "gołąbki", "placki ziemniaczane", "koktajl owocowy",
+]
+
+def _user_days(rnd: random.Random, uid: int, years: int) -> Iterator[Tuple[str, List[tuple], List[tuple], bool]]:
+    """Per day: (date, measurements, meals, saved)."""
+    weight = rnd.uniform(60, 110)
+    day = END - timedelta(days=365 * years - 1)
+    while day <= END:
+        d = day.isoformat()
+        measurements = []
+        if rnd.random() < 0.6:
+            weight = min(150.0, max(40.0, weight + rnd.gauss(-0.02, 0.3)))
+            measurements.append((d, round(weight, 1), uid))
+        meals = [(d, rnd.choice(MEAL_NAMES), rnd.randint(80, 900), uid) for _ in range(rnd.randint(2, 5))]
+        yield d, measurements, meals, rnd.random() < 0.9
+        day += timedelta(days=1)
+
+def generate(users: int, years: int, seed: int = 42) -> Dict[str, int]:
+    """Insert the synthetic rows into a fresh database; returns row counts per table."""
+    from app.core.db import engine, ensure_schema, rebuild_nutrition_rollups
+    ensure_schema()
+    rnd = random.Random(seed)
+    counts = {"user": users, "measurement": 0, "meal": 0, "savedday": 0}
+    with engine.begin() as conn:
+        if conn.exec_driver_sql("SELECT count(*) FROM user").scalar():
+            raise ValueError(f"{engine.url.database} already has users; point DB_PATH at a new file")
+        conn.exec_driver_sql(
+            "INSERT INTO user (id, email, password_hash, created_at, daily_kcal_goal) VALUES (?, ?, 'x', '2020-01-01 00:00:00', ?)",
+            [(u, f"user{u}@example.com", rnd.choice([1800, 2000, 2200, 2500])) for u in range(1, users + 1)],
+        )
+    for uid in range(1, users + 1):
+        measurements, meals, saved = [], [], []
+        for d, ms, ml, is_saved in _user_days(rnd, uid, years):
+            measurements.extend(ms)
+            meals.extend(ml)
+            if is_saved:
+                saved.append((d, uid))
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO measurement (date, weight_kg, user_id) VALUES (?, ?, ?)", measurements)
+            conn.exec_driver_sql("INSERT INTO meal (date, name, kcal, user_id) VALUES (?, ?, ?, ?)", meals)
+            conn.exec_driver_sql(
+                "INSERT INTO savedday (date, user_id, total_kcal, saved_at) VALUES (?, ?, 0, '2020-01-01 00:00:00')", saved
+            )
+        counts["measurement"] += len(measurements)
+        counts["meal"] += len(meals)
+        counts["savedday"] += len(saved)
+    with engine.begin() as conn:
+        rebuild_nutrition_rollups(conn)
+        conn.exec_driver_sql("ANALYZE")
+    return counts
+
+if __name__ == "__main__":
+    print(generate(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+    ))
@@ -0,0 +1,103 @@
+"""Shared fixtures: a throwaway database and a local stand-in for the upstream sites.
+
+The environment is set here, before any test imports app.core, so the app
+reads its configuration from a temporary directory.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DB_PATH"] = os.path.join(_tmp.name, "test.db")
+os.environ.setdefault("PLOT_WORKERS", "0")
+os.environ.setdefault("TIPS_REFRESH_INTERVAL", "0")
+os.environ.setdefault("SQLITE_MAINTENANCE_INTERVAL", "0")
+
+class Upstream:
+    """Canned OpenFoodFacts search, DuckDuckGo result pages and product pages.
+
+    products maps a lower-cased search term to the OFF products returned for it; pages maps
+    a page path to its HTML and delays a path to seconds to wait before answering. Every
+    request path is appended to hits.
+    """
+
+    def __init__(self):
+        self.products = {}
+        self.pages = {}
+        self.delays = {}
+        self.hits = []
+        self.lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                with upstream.lock:
+                    upstream.hits.append(url.path)
+                time.sleep(upstream.delays.get(url.path, 0))
+                args = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path == "/off":
+                    body = json.dumps({"products": upstream.products.get(args.get("search_terms", "").lower(), [])}).encode()
+                    ctype = "application/json"
+                elif url.path == "/ddg":
+                    body = "".join(
+                        f'<a class="result__a" href="{upstream.base}{path}">r</a>' for path in upstream.pages
+                    ).encode()
+                    ctype = "text/html; charset=utf-8"
+                elif url.path in upstream.pages:
+                    body = upstream.pages[url.path].encode()
+                    ctype = "text/html; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def count(self, path: str) -> int:
+        with self.lock:
+            return self.hits.count(path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from app.core.db import ensure_schema
+    ensure_schema()
+
+@pytest.fixture
+def upstream(monkeypatch):
+    from app.services import kcal, recipes
+    server = Upstream()
+    monkeypatch.setattr(kcal, "OPENFOODFACTS_SEARCH_URL", f"{server.base}/off")
+    monkeypatch.setattr(recipes, "DUCKDUCKGO_HTML_URL", f"{server.base}/ddg")
+    yield server
+    server.close()
+
+@pytest.fixture(scope="module")
+def client(request):
+    """A TestClient logged in as a user registered for this test module."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as c:
+        c.post("/register", data={"email": f"{request.module.__name__}@example.com", "password": "x"})
+        yield c
@@ -0,0 +1,11 @@
+from fastapi.testclient import TestClient
+from app.main import app
+
+def test_cache_stats_need_a_session():
+    with TestClient(app) as client:
+        r = client.get("/cache-stats", follow_redirects=False)
+        assert r.status_code == 303 and r.headers["location"] == "/login"
+        client.post("/register", data={"email": "stats@example.com", "password": "x"})
+        r = client.get("/cache-stats")
+        assert r.status_code == 200
+        assert set(r.json()) == {"measurements", "plots", "meal_suggestions"}
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import pytest
+from app.core.config import DB_PATH
+from app.core.db import engine
+from app.services.food_db import import_food_dump, search_foods
+
+DUMP = os.path.join(os.path.dirname(__file__), "data", "food_dump.jsonl")
+
+@pytest.fixture(autouse=True)
+def foods():
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM food")
+    assert import_food_dump(DUMP, batch_size=2) == (5, 3)
+
+def _names(query):
+    return [r["name"] for r in search_foods(query)]
+
+def test_import_reads_kcal_and_converts_kj():
+    with engine.connect() as conn:
+        rows = dict(conn.exec_driver_sql("SELECT code, kcal_100g FROM food").fetchall())
+    assert rows == {"590001": 52.0, "590002": 38.0, "590003": 349.9, "590004": 240.0, "590005": 44.0}
+
+def test_reimport_merges_and_keeps_one_row_per_code():
+    assert import_food_dump(DUMP) == (5, 3)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT count(*) FROM food").scalar() == 5
+        assert conn.exec_driver_sql("SELECT count(*) FROM food_fts").scalar() == 5
+
+@pytest.mark.parametrize("query, expected", [
+    ("jablko", "Jabłko Szampion (Sad Łącki)"),
+    ("JABŁKO", "Jabłko Szampion (Sad Łącki)"),
+    ("apple", "Jabłko Szampion (Sad Łącki)"),
+    ("zurek slaski", "Żurek śląski (Krakus)"),
+    ("zolty", "Ser żółty Gouda"),
+    ("lacki", "Jabłko Szampion (Sad Łącki)"),
+    ("sliwki", "Śliwki suszone"),
+    ("jablka", "Jabłko Szampion (Sad Łącki)"),  # typo, trigram overlap
+])
+def test_search_folds_diacritics(query, expected):
+    assert _names(query)[0] == expected
+
+@pytest.mark.parametrize("query, expected", [
+    # "apple" (the English name) is the tighter match, so Jabłko ranks first.
+    ("ja", ["Jabłko Szampion (Sad Łącki)", "Ja 100% sok"]),
+    ("Ż", ["Żurek śląski (Krakus)", "Ser żółty Gouda"]),
+    ("s", ["Śliwki suszone", "Ser żółty Gouda", "Jabłko Szampion (Sad Łącki)", "Ja 100% sok", "Żurek śląski (Krakus)"]),
+    ("%", []),
+    ("_", []),
+    ("  ", []),
+])
+def test_short_queries_match_name_and_word_prefixes(query, expected):
+    assert _names(query) == expected
+
+def test_writes_without_the_app_functions_keep_the_index():
+    # A plain sqlite3 connection has no py_fold; the triggers must not need it.
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.execute(
+            "INSERT INTO food (code, name_pl, kcal_100g, name_pl_folded) VALUES ('590010', 'Gruszka', 57, 'gruszka')"
+        )
+        conn.execute("UPDATE food SET kcal_100g = 53 WHERE code = '590001'")
+        conn.execute("DELETE FROM food WHERE code = '590004'")
+    conn.close()
+    assert _names("gruszka") == ["Gruszka"]
+    assert search_foods("jablko")[0]["kcal_100g"] == 53
+    assert _names("sliwki") == []
@@ -0,0 +1,67 @@
+import io
+from datetime import date
+import pytest
+from app.core.db import engine, rebuild_user_totals
+from app.core.pagination import MAX_ROW_ID, decode_cursor, encode_cursor
+from app.services.import_export import import_measurements_csv
+from app.services.meals import get_meal_history_page
+from app.services.measurements import get_measurement_page
+
+@pytest.mark.parametrize("raw", [
+    None, "", "garbage", "2024-01-03", "2024-13-01_5", "2024-01-03_-5", "2024-01-03_+5",
+    "2024-01-03_ 5", f"2024-01-03_{MAX_ROW_ID + 1}", "2024-01-03_99999999999999999999999",
+])
+def test_invalid_cursors_mean_the_first_page(raw):
+    assert decode_cursor(raw) is None
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(date(2024, 1, 3), MAX_ROW_ID)) == (date(2024, 1, 3), MAX_ROW_ID)
+
+@pytest.mark.parametrize("path", ["/history", "/meals/history"])
+def test_oversized_cursor_shows_the_first_page(client, path):
+    r = client.get(path, params={"before": "2024-01-03_99999999999999999999999"})
+    assert r.status_code == 200
+
+def _totals(uid):
+    with engine.connect() as conn:
+        kept = conn.exec_driver_sql(
+            "SELECT measurements, saved_days FROM usertotals WHERE user_id = ?", (uid,)
+        ).first() or (0, 0)
+        counted = (
+            conn.exec_driver_sql("SELECT count(*) FROM measurement WHERE user_id = ?", (uid,)).scalar(),
+            conn.exec_driver_sql("SELECT count(*) FROM savedday WHERE user_id = ?", (uid,)).scalar(),
+        )
+    return tuple(kept), counted
+
+def test_unfiltered_totals_follow_every_write():
+    uid = 9001
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO measurement (date, weight_kg, user_id) VALUES (?, ?, ?)",
+            [(f"2024-01-{d:02d}", 80.0, uid) for d in range(1, 11)],
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO savedday (date, user_id, total_kcal, saved_at) VALUES (?, ?, 0, '2024-01-01')",
+            [(f"2024-01-{d:02d}", uid) for d in range(1, 4)],
+        )
+    assert _totals(uid) == ((10, 3), (10, 3))
+
+    import_measurements_csv(uid, io.BytesIO(b"05/01/2024,79.5\n15/01/2024,79.0\n"))  # one update, one insert
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM measurement WHERE user_id = ? AND date = '2024-01-02'", (uid,))
+        conn.exec_driver_sql("UPDATE measurement SET user_id = ? WHERE user_id = ? AND date = '2024-01-03'", (uid + 1, uid))
+        conn.exec_driver_sql("DELETE FROM savedday WHERE user_id = ? AND date = '2024-01-01'", (uid,))
+    assert _totals(uid) == ((9, 2), (9, 2))
+    assert _totals(uid + 1) == ((1, 0), (1, 0))
+
+    page = get_measurement_page(uid, limit=4)
+    assert page.total == 9 and len(page.items) == 4
+    assert get_measurement_page(uid, "2024-01").total == 9
+    assert get_meal_history_page(uid).total == 2
+    assert get_meal_history_page(uid, d_from=date(2024, 1, 3)).total == 1
+
+def test_rebuild_user_totals_recounts():
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE usertotals SET measurements = 0, saved_days = 0")
+        rebuild_user_totals(conn)
+    assert _totals(9001) == ((9, 2), (9, 2))
@@ -0,0 +1,46 @@
+import asyncio
+import time
+import pytest
+from app.core.http_client import ascrape, scrape
+
+LINKS = {"a": ["1", "2", "3"], "b": ["2", "3", "4"]}
+
+def _sync(queries, fetch, want, **kw):
+    def search(q, deadline):
+        if q not in LINKS:
+            raise ConnectionError(q)
+        return LINKS[q]
+    return scrape(queries, search, lambda url, deadline: fetch(url), want, time.monotonic() + 5, **kw)
+
+def _async(queries, fetch, want, **kw):
+    async def search(q, deadline):
+        if q not in LINKS:
+            raise ConnectionError(q)
+        return LINKS[q]
+
+    async def afetch(url, deadline):
+        return fetch(url)
+
+    return asyncio.run(ascrape(queries, search, afetch, want, time.monotonic() + 5, **kw))
+
+@pytest.fixture(params=[_sync, _async], ids=["scrape", "ascrape"])
+def run(request):
+    return request.param
+
+def test_links_are_fetched_once(run):
+    fetched = []
+    items = run(["a", "b"], lambda url: fetched.append(url) or url, 10)
+    assert sorted(items) == sorted(fetched) == ["1", "2", "3", "4"]
+
+def test_stops_at_want_and_drops_none_and_duplicate_keys(run):
+    items = run(["a", "b"], lambda url: None if url == "1" else {"k": int(url) % 2}, 5, key=lambda d: d["k"])
+    assert sorted(d["k"] for d in items) == [0, 1]
+    assert len(run(["a", "b"], lambda url: url, 2)) == 2
+
+def test_exclude_filters_keys(run):
+    assert sorted(run(["a"], lambda url: url, 5, key=lambda u: u, exclude=["2"])) == ["1", "3"]
+
+def test_search_error_raised_only_when_every_search_failed(run):
+    with pytest.raises(ConnectionError):
+        run(["x", "y"], lambda url: url, 5)
+    assert sorted(run(["x", "a"], lambda url: url, 5)) == ["1", "2", "3"]
@@ -0,0 +1,91 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+from app.core.db import engine
+from app.services.import_export import ImportResult, export_chunks, gzip_chunks, import_measurements_csv
+
+UID = 8001
+
+@pytest.fixture(autouse=True)
+def empty_user():
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM measurement WHERE user_id IN (?, ?)", (UID, UID + 1))
+        conn.exec_driver_sql("DELETE FROM meal WHERE user_id = ?", (UID,))
+
+def _import(text, uid=UID, **kw):
+    return import_measurements_csv(uid, io.BytesIO(text.encode("utf-8")), **kw)
+
+def _rows(uid=UID):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT date, weight_kg FROM measurement WHERE user_id = ? ORDER BY date, id", (uid,)
+        ).fetchall()
+
+def _export(dataset, fmt, **kw):
+    return b"".join(export_chunks(dataset, fmt, UID, **kw))
+
+def test_counts_inserts_updates_and_skips():
+    assert _import("01/01/2024,80.0\n02/01/2024,79.5\n") == ImportResult(2, 0, 0)
+    # A byte-order mark (Excel) is dropped; the three bad lines are skipped.
+    result = _import("\ufeff02/01/2024,79.0\n03/01/2024,78.8\nnot a line\n31/02/2024,70\n04/01/2024,abc\n\n")
+    assert result == ImportResult(1, 1, 3)
+    assert _rows() == [("2024-01-01", 80.0), ("2024-01-02", 79.0), ("2024-01-03", 78.8)]
+
+@pytest.mark.parametrize("batch_size", [1, 2, 5000])
+def test_last_line_for_a_date_wins(batch_size):
+    _import("01/01/2024,80.0\n02/01/2024,79.0\n01/01/2024,81.0\n01/01/2024,82.0\n", batch_size=batch_size)
+    assert _rows() == [("2024-01-01", 82.0), ("2024-01-02", 79.0)]
+
+def test_reimporting_an_export_changes_nothing():
+    _import("".join(f"{d:02d}/03/2024,{80 - d / 10:.1f}\n" for d in range(1, 21)))
+    before = _rows()
+    exported = _export("measurements", "csv", page_size=7)
+    assert _import(exported.decode("utf-8"), batch_size=6) == ImportResult(0, 20, 0)
+    assert _rows() == before
+    # Into an empty account the same file recreates the rows.
+    assert _import(exported.decode("utf-8"), uid=UID + 1) == ImportResult(20, 0, 0)
+    assert _rows(UID + 1) == before
+
+def _add_meals(n):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO meal (date, name, kcal, user_id) VALUES (?, ?, ?, ?)",
+            [(f"2024-04-{1 + i // 3:02d}", f"Zupa, \"pomidorowa\" {i}", 100 + i, UID) for i in range(n)],
+        )
+    with engine.connect() as conn:
+        return [tuple(r) for r in conn.exec_driver_sql(
+            "SELECT date, name, kcal FROM meal WHERE user_id = ? ORDER BY date, id", (UID,)
+        )]
+
+def test_csv_export_round_trips_over_several_pages():
+    meals = _add_meals(10)
+    chunks = list(export_chunks("meals", "csv", UID, page_size=3))
+    assert len(chunks) == 5  # header, then 4 pages of at most 3 rows
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert rows[0] == ["date", "name", "kcal"]
+    assert [(d, n, int(k)) for d, n, k in rows[1:]] == meals
+
+def test_ndjson_export_round_trips_over_several_pages():
+    meals = _add_meals(10)
+    chunks = list(export_chunks("meals", "ndjson", UID, page_size=4))
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert [(r["date"], r["name"], r["kcal"]) for r in map(json.loads, lines)] == meals
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_gzip_export_decompresses_to_the_plain_one(fmt):
+    _add_meals(10)
+    plain = _export("meals", fmt, page_size=3)
+    assert gzip.decompress(b"".join(gzip_chunks(export_chunks("meals", fmt, UID, page_size=3)))) == plain
+
+def test_parquet_export_round_trips():
+    pq = pytest.importorskip("pyarrow.parquet")
+    meals = _add_meals(10)
+    table = pq.read_table(io.BytesIO(_export("meals", "parquet", page_size=4)))
+    assert [(r["date"], r["name"], r["kcal"]) for r in table.to_pylist()] == meals
+
+def test_empty_export():
+    assert _export("measurements", "csv") == b""
+    assert _export("meals", "csv") == b"date,name,kcal\n"
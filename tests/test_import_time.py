@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use. numpy is exempt on purpose: see LAZY_MODULES in benchmarks/bench_import_time.py.
+HEAVY = ("matplotlib", "pyarrow", "bs4", "pandas", "requests", "httpx", "deep_translator", "lxml")
+
+def test_heavy_modules_are_not_imported_with_the_app():
+    # A fresh interpreter: this test session has long since imported most of them.
+    probe = f"import sys, app.main; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from sqlmodel import Session
+from app.core.config import KCAL_CACHE_TTL
+from app.core.db import async_engine, engine, warm_up_async_engine
+from app.core.http_client import close_async_http
+from app.models import KcalLookup
+from app.services import kcal
+
+PEAR_PAGE = "<title>Gruszka</title><p>Wartość odżywcza na 100 g: 57 kcal</p>"
+APPLE = {"product_name": "Jabłko", "nutriments": {"energy-kcal_100g": 52}, "url": "https://example.org/jablko"}
+
+@pytest.fixture(autouse=True)
+def clean_cache(monkeypatch):
+    # The local food table is covered by test_food_db; these tests are about the upstream path.
+    monkeypatch.setattr(kcal, "KCAL_LOCAL_FIRST", False)
+    with Session(engine) as session:
+        session.connection().exec_driver_sql("DELETE FROM kcallookup")
+        session.commit()
+
+def _cached(key: str):
+    with Session(engine) as session:
+        return session.get(KcalLookup, key)
+
+def _wait_for_refresh(key: str, timeout: float = 10) -> None:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        with kcal._refreshing_lock:
+            if key not in kcal._refreshing:
+                return
+        time.sleep(0.02)
+    raise AssertionError(f"refresh of {key!r} did not finish")
+
+def test_cold_lookup_goes_upstream_and_is_cached(upstream):
+    upstream.products["jabłko"] = [APPLE]
+    results = kcal.find_kcal_info("Jabłko", max_results=3)
+    assert [(r["name"], r["kcal_100g"]) for r in results] == [("Jabłko", 52)]
+    assert upstream.count("/off") == 1
+    row = _cached("jabłko")
+    assert row is not None and json.loads(row.results_json) == results
+
+def test_warm_lookup_is_served_from_cache(upstream):
+    upstream.products["jabłko"] = [APPLE]
+    first = kcal.find_kcal_info("jabłko", max_results=3)
+    # Same query after normalisation (case, spacing): no second upstream call.
+    assert kcal.find_kcal_info("  JABŁKO ", max_results=3) == first
+    assert upstream.count("/off") == 1
+
+def test_fallback_scrape_when_the_food_api_has_nothing(upstream):
+    upstream.pages["/page/1"] = PEAR_PAGE
+    results = kcal.find_kcal_info("gruszka", max_results=1)
+    assert results == [{"name": "Gruszka", "kcal_100g": 57.0, "source": f"{upstream.base}/page/1"}]
+    assert upstream.count("/ddg") >= 1
+
+def test_lookup_cut_off_by_the_deadline_is_not_cached(upstream, monkeypatch):
+    monkeypatch.setattr(kcal, "KCAL_DEADLINE", 1.0)
+    upstream.pages["/page/1"] = PEAR_PAGE
+    upstream.delays["/page/1"] = 3
+    assert kcal.find_kcal_info("gruszka", max_results=1) == []
+    assert _cached("gruszka") is None
+
+def test_partial_results_are_returned_but_not_cached(upstream, monkeypatch):
+    monkeypatch.setattr(kcal, "KCAL_DEADLINE", 1.0)
+    upstream.pages["/page/1"] = PEAR_PAGE
+    upstream.pages["/page/2"] = "<title>Gruszka klapsa</title><p>Wartość odżywcza na 100 g: 60 kcal</p>"
+    upstream.delays["/page/2"] = 3
+    assert [r["kcal_100g"] for r in kcal.find_kcal_info("gruszka", max_results=2)] == [57.0]
+    assert _cached("gruszka") is None
+
+def test_async_lookup_cut_off_by_the_deadline_is_not_cached(upstream, monkeypatch):
+    monkeypatch.setattr(kcal, "KCAL_DEADLINE", 1.0)
+    upstream.pages["/page/1"] = PEAR_PAGE
+    upstream.delays["/page/1"] = 3
+
+    async def run():
+        try:
+            await warm_up_async_engine()
+            return await kcal.afind_kcal_info("gruszka", max_results=1)
+        finally:
+            await close_async_http()
+            await async_engine.dispose()
+
+    assert asyncio.run(run()) == []
+    assert _cached("gruszka") is None
+
+def test_stale_entry_is_kept_when_the_refresh_times_out(upstream, monkeypatch):
+    upstream.pages["/page/1"] = PEAR_PAGE
+    kcal.find_kcal_info("gruszka", max_results=1)
+    with Session(engine) as session:
+        row = session.get(KcalLookup, "gruszka")
+        row.fetched_at -= KCAL_CACHE_TTL + 1
+        session.add(row)
+        session.commit()
+    monkeypatch.setattr(kcal, "KCAL_DEADLINE", 1.0)
+    upstream.delays["/page/1"] = 3
+    assert kcal.find_kcal_info("gruszka", max_results=1)[0]["kcal_100g"] == 57.0
+    _wait_for_refresh("gruszka")
+    assert json.loads(_cached("gruszka").results_json)[0]["kcal_100g"] == 57.0
+
+def test_stale_entry_is_served_and_refreshed_in_background(upstream):
+    upstream.products["jabłko"] = [APPLE]
+    kcal.find_kcal_info("jabłko", max_results=3)
+    with Session(engine) as session:
+        row = session.get(KcalLookup, "jabłko")
+        row.fetched_at -= KCAL_CACHE_TTL + 1
+        session.add(row)
+        session.commit()
+    upstream.products["jabłko"] = [{**APPLE, "nutriments": {"energy-kcal_100g": 54}}]
+
+    stale = kcal.find_kcal_info("jabłko", max_results=3)
+    assert stale[0]["kcal_100g"] == 52
+    _wait_for_refresh("jabłko")
+    assert upstream.count("/off") == 2
+    assert kcal.find_kcal_info("jabłko", max_results=3)[0]["kcal_100g"] == 54
+
+def test_upstream_failure_is_not_cached(upstream):
+    upstream.close()
+    with pytest.raises(Exception):
+        kcal.find_kcal_info("śliwka", max_results=3)
+    assert _cached("śliwka") is None
+
+def test_failed_refresh_keeps_the_stale_entry(upstream):
+    upstream.products["jabłko"] = [APPLE]
+    kcal.find_kcal_info("jabłko", max_results=3)
+    with Session(engine) as session:
+        row = session.get(KcalLookup, "jabłko")
+        row.fetched_at -= KCAL_CACHE_TTL + 1
+        session.add(row)
+        session.commit()
+    upstream.close()
+    assert kcal.find_kcal_info("jabłko", max_results=3)[0]["kcal_100g"] == 52
+    _wait_for_refresh("jabłko")
+    assert json.loads(_cached("jabłko").results_json)[0]["kcal_100g"] == 52
+
+def test_concurrent_first_writes_do_not_collide():
+    # Concurrent first lookups of one query all finish their upstream fetch and write the key.
+    start = threading.Barrier(8)
+    errors = []
+
+    def write(n):
+        try:
+            start.wait()
+            kcal._store("banan", 3, [{"name": "Banan", "kcal_100g": 89 + n, "source": ""}])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert 89 <= json.loads(_cached("banan").results_json)[0]["kcal_100g"] < 97
+
+def test_async_lookup(upstream):
+    upstream.products["banan"] = [{"product_name": "Banan", "nutriments": {"energy-kcal_100g": 89}}]
+
+    async def run():
+        try:
+            await warm_up_async_engine()
+            return await asyncio.gather(*(kcal.afind_kcal_info("banan", max_results=3) for _ in range(4)))
+        finally:
+            await close_async_http()
+            await async_engine.dispose()
+
+    results = asyncio.run(run())
+    assert all(r == results[0] for r in results)
+    assert results[0][0]["kcal_100g"] == 89
+    assert _cached("banan") is not None
@@ -0,0 +1,52 @@
+from datetime import date
+import pytest
+from app.core.db import engine
+from app.services import meal_suggest
+from app.services.meals import invalidate_meals
+
+UID = 7001
+
+@pytest.fixture(autouse=True)
+def clean():
+    meal_suggest._indexes.pop(UID)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM meal WHERE user_id = ?", (UID,))
+
+def _add_meal(name, kcal):
+    # What /meals/add does after its commit.
+    with engine.begin() as conn:
+        meal_id = conn.exec_driver_sql(
+            "INSERT INTO meal (date, name, kcal, user_id) VALUES (?, ?, ?, ?)",
+            (date.today().isoformat(), name, kcal, UID),
+        ).lastrowid
+    invalidate_meals(UID)
+    meal_suggest.record_meal_added(UID, meal_id, date.today(), name, kcal)
+    return meal_id
+
+def _names(prefix):
+    return [s["name"] for s in meal_suggest.suggest_meals(UID, prefix)]
+
+def test_added_and_removed_meals_reach_a_cached_index():
+    _add_meal("Owsianka", 350)
+    assert _names("ow") == ["Owsianka"]
+    meal_id = _add_meal("Omlet", 300)
+    assert _names("o") == ["Omlet", "Owsianka"]
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM meal WHERE id = ?", (meal_id,))
+    invalidate_meals(UID)
+    meal_suggest.record_meal_removed(UID, meal_id, "Omlet")
+    assert _names("o") == ["Owsianka"]
+
+def test_meal_added_while_the_index_loads_is_not_lost(monkeypatch):
+    _add_meal("Owsianka", 350)
+    load = meal_suggest._load_index
+
+    def load_then_write(uid):
+        idx = load(uid)
+        monkeypatch.setattr(meal_suggest, "_load_index", load)
+        _add_meal("Omlet", 300)  # committed after the load read the table
+        return idx
+
+    monkeypatch.setattr(meal_suggest, "_load_index", load_then_write)
+    meal_suggest.suggest_meals(UID, "o")
+    assert _names("o") == ["Omlet", "Owsianka"]
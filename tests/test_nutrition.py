@@ -0,0 +1,67 @@
+from datetime import date
+from sqlmodel import Session
+from app.core.db import engine, rebuild_nutrition_rollups
+from app.models import Meal
+from app.services.nutrition import record_meal_change
+
+def _uid():
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT id FROM user WHERE email = ?", (f"{__name__}@example.com",)).scalar()
+
+def _add(uid, day, name, kcal):
+    # The same writes /meals/add makes, for days other than today.
+    with Session(engine) as session:
+        m = Meal(date=day, name=name, kcal=kcal, user_id=uid)
+        session.add(m)
+        record_meal_change(session, uid, day, kcal, 1)
+        session.commit()
+        return m.id
+
+def _rollups(uid):
+    with engine.connect() as conn:
+        return [
+            conn.exec_driver_sql(sql, (uid,)).fetchall()
+            for sql in (
+                "SELECT date, total_kcal, meal_count, goal_kcal, delta_kcal FROM dailynutrition WHERE user_id = ? ORDER BY date",
+                "SELECT period, start, total_kcal, meal_count, days, goal_kcal, delta_kcal FROM periodnutrition "
+                "WHERE user_id = ? ORDER BY period, start",
+                "SELECT date, total_kcal FROM savedday WHERE user_id = ? ORDER BY date",
+            )
+        ]
+
+def _rebuilt(uid):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM dailynutrition WHERE user_id = ?", (uid,))
+        conn.exec_driver_sql("DELETE FROM periodnutrition WHERE user_id = ?", (uid,))
+        rebuild_nutrition_rollups(conn)
+    return _rollups(uid)
+
+def test_rollups_match_a_rebuild_after_adds_edits_and_deletes(client):
+    uid = _uid()
+    # Across a week and a month boundary (2024-01-29 is a Monday).
+    for day, name, kcal in [
+        (date(2024, 1, 28), "Owsianka", 350), (date(2024, 1, 28), "Zupa", 420), (date(2024, 1, 29), "Omlet", 300),
+        (date(2024, 1, 31), "Kanapka", 250), (date(2024, 2, 1), "Makaron", 600), (date(2024, 2, 1), "Jabłko", 80),
+    ]:
+        _add(uid, day, name, kcal)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO savedday (date, user_id, total_kcal, saved_at) VALUES ('2024-02-01', ?, 680, '2024-02-01')", (uid,)
+        )
+    # Today's meals through the routes, edited and deleted there too.
+    client.post("/meals/add", data={"name": "Kasza", "kcal": 500})
+    client.post("/meals/add", data={"name": "Jogurt", "kcal": 150})
+    client.post("/meals/save-day")
+    with engine.connect() as conn:
+        ids = dict(conn.exec_driver_sql("SELECT name, id FROM meal WHERE user_id = ?", (uid,)).fetchall())
+    client.post(f"/meals/delete/{ids['Jogurt']}")
+    client.post(f"/meals/delete/{ids['Jabłko']}")
+    client.post(f"/meals/delete/{ids['Kanapka']}")  # the day's only meal
+    # Edits last, so no later write to the same week or month re-sums over a missed update.
+    client.post(f"/meals/edit/{ids['Kasza']}", data={"name": "Kasza gryczana", "kcal": 450})
+    client.post(f"/meals/edit/{ids['Makaron']}", data={"name": "Makaron", "kcal": 650})
+
+    daily, periods, saved = _rollups(uid)
+    assert [d for d, *_ in daily] == ["2024-01-28", "2024-01-29", "2024-02-01", date.today().isoformat()]
+    assert ("2024-02-01", 650) in saved
+    assert _rebuilt(uid) == [daily, periods, saved]
@@ -0,0 +1,61 @@
+from array import array
+from datetime import date
+import pytest
+from app.services.measurements import MeasurementRow, MeasurementSeries, compile_periods, filter_by_periods
+
+ROWS = [MeasurementRow(i, date.fromisoformat(d), 80.0 - i) for i, d in enumerate(
+    ["2023-06-30", "2023-12-31", "2024-01-01", "2024-03-31", "2024-04-01", "2024-06-30", "2024-07-01"]
+)]
+
+def _span(a, b):
+    return date.fromisoformat(a).toordinal(), date.fromisoformat(b).toordinal()
+
+@pytest.mark.parametrize("token, expected", [
+    ("2024", [_span("2024-01-01", "2025-01-01")]),
+    ("2024-03", [_span("2024-03-01", "2024-04-01")]),
+    ("2024-12", [_span("2024-12-01", "2025-01-01")]),
+    ("2024Q1", [_span("2024-01-01", "2024-04-01")]),
+    ("2024Q4", [_span("2024-10-01", "2025-01-01")]),
+    ("2024H1", [_span("2024-01-01", "2024-07-01")]),
+    ("2024H2", [_span("2024-07-01", "2025-01-01")]),
+    (" 2024Q2 ", [_span("2024-04-01", "2024-07-01")]),
+    ("2023-11..2024-02", [_span("2023-11-01", "2024-03-01")]),
+    ("2023Q4..2024H1", [_span("2023-10-01", "2024-07-01")]),
+])
+def test_accepted_tokens(token, expected):
+    assert compile_periods(token) == expected
+
+@pytest.mark.parametrize("token", [
+    "2024-Q1", "2024-H2", "2024q1", "2024Q5", "2024Q0", "2024H3", "2024-13", "2024-00", "2024-3",
+    "24", "20245", "abcd", "2024..", "..2024", "2024..2023",
+])
+def test_unknown_tokens_match_nothing(token):
+    assert compile_periods(token) == []
+    assert filter_by_periods(ROWS, token) == []
+
+@pytest.mark.parametrize("filters", [None, "", " ", ",", " , "])
+def test_no_filter(filters):
+    assert compile_periods(filters) is None
+    assert filter_by_periods(ROWS, filters) is ROWS
+
+def test_spans_are_sorted_and_merged():
+    assert compile_periods("2024H2,2023,2024Q1,2024-05") == [
+        _span("2023-01-01", "2024-04-01"), _span("2024-05-01", "2024-06-01"), _span("2024-07-01", "2025-01-01"),
+    ]
+
+def test_unknown_tokens_are_dropped_next_to_valid_ones():
+    assert compile_periods("2024-Q1,2023") == compile_periods("2023")
+
+@pytest.mark.parametrize("filters, expected_ids", [
+    ("2024Q1", [2, 3]),
+    ("2024H1", [2, 3, 4, 5]),
+    ("2023,2024H2", [0, 1, 6]),
+    ("2023-12..2024-01", [1, 2]),
+    ("2022", []),
+])
+def test_rows_and_series_filter_alike(filters, expected_ids):
+    assert [m.id for m in filter_by_periods(ROWS, filters)] == expected_ids
+    series = MeasurementSeries(
+        array("q", (m.id for m in ROWS)), array("l", (m.date.toordinal() for m in ROWS)), array("d", (m.weight_kg for m in ROWS)),
+    )
+    assert [m.id for m in filter_by_periods(series, filters).rows()] == expected_ids
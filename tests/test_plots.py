@@ -0,0 +1,31 @@
+import pytest
+
+def _etag(client, path, **headers):
+    r = client.get(path, headers=headers)
+    assert r.status_code == 200 and r.headers["content-type"] == "image/png"
+    return r.headers["etag"]
+
+@pytest.mark.parametrize("path", ["/plot", "/plot?trend=1", "/plot-weekly-changes", "/plot-meals-daily"])
+def test_repeat_request_with_the_etag_gets_304(client, path):
+    etag = _etag(client, path)
+    r = client.get(path, headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["etag"] == etag
+    assert client.get(path, headers={"If-None-Match": '"stale", W/' + etag}).status_code == 304
+    assert client.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+def test_adding_a_measurement_changes_the_etag(client):
+    client.post("/add", data={"date_str": "2024-01-01", "weight": 80})
+    etag = _etag(client, "/plot")
+    client.post("/add", data={"date_str": "2024-01-08", "weight": 79})
+    r = client.get("/plot", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+def test_adding_a_meal_changes_the_meals_plot_etag(client):
+    etag = _etag(client, "/plot-meals-daily")
+    client.post("/meals/add", data={"name": "Owsianka", "kcal": 350})
+    client.post("/meals/save-day")  # the plot shows saved days only
+    r = client.get("/plot-meals-daily", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from app.core.db import async_engine, engine, warm_up_async_engine
+from app.core.profiler import QueryBudgetExceeded, max_queries, normalize_sql, profile_queries
+
+def _run(*statements):
+    with engine.connect() as conn:
+        for s in statements:
+            conn.exec_driver_sql(s)
+
+def test_going_over_the_budget_is_reported():
+    with pytest.raises(QueryBudgetExceeded) as e:
+        with max_queries(2):
+            _run("SELECT 1", "SELECT 2", "SELECT 'x' WHERE 3 IN (1, 2, 3)")
+    assert e.value.budget == 2
+    assert len(e.value.log) == 3
+    assert "3 SQL statements, budget 2" in str(e.value)
+    assert "SELECT ? WHERE ? IN (?)" in str(e.value)
+
+def test_within_the_budget():
+    with max_queries(2) as log:
+        _run("SELECT 1", "SELECT 2")
+    assert [q.shape for q in log.queries] == ["SELECT ?", "SELECT ?"]
+
+def test_nested_logs_each_count_their_statements():
+    with profile_queries() as outer:
+        _run("SELECT 1")
+        with pytest.raises(QueryBudgetExceeded):
+            with max_queries(0):
+                _run("SELECT 2")
+    assert len(outer) == 2
+
+def test_async_statements_are_counted():
+    async def run():
+        try:
+            await warm_up_async_engine()
+            with max_queries(1) as log:
+                async with async_engine.connect() as conn:
+                    await conn.exec_driver_sql("SELECT 1")
+            return log
+        finally:
+            await async_engine.dispose()
+
+    assert len(asyncio.run(run())) == 1
+
+def test_repeated_shapes_are_n_plus_one_suspects():
+    with profile_queries() as log:
+        _run(*(f"SELECT name FROM meal WHERE id = {i}" for i in range(5)), "SELECT 1")
+    assert log.repeated(threshold=5) == [("SELECT name FROM meal WHERE id = ?", 5)]
+    assert log.repeated(threshold=6) == []
+
+@pytest.mark.parametrize("statement, shape", [
+    ("SELECT  *\n FROM t WHERE a = 'it''s' AND b = 1.5", "SELECT * FROM t WHERE a = ? AND b = ?"),
+    ("SELECT * FROM t WHERE id IN (?, ?, ?)", "SELECT * FROM t WHERE id IN (?)"),
+    ("SELECT t1.id FROM t1", "SELECT t1.id FROM t1"),
+])
+def test_normalize_sql(statement, shape):
+    assert normalize_sql(statement) == shape
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import pytest
+from app.core.db import async_engine, engine, warm_up_async_engine
+from app.core.http_client import close_async_http
+from app.services import recipes
+
+def _page(title, ingredients=None, name=None, calories=None, body=""):
+    ld = ""
+    if ingredients is not None:
+        recipe = {"@type": "Recipe", "recipeIngredient": ingredients}
+        if name:
+            recipe["name"] = name
+        if calories:
+            recipe["nutrition"] = {"calories": calories}
+        ld = f'<script type="application/ld+json">{json.dumps({"@graph": [recipe]})}</script>'
+    return f"<html><head><title>{title}</title>{ld}</head><body>{body} {' '.join(ingredients or [])}</body></html>"
+
+@pytest.fixture(autouse=True)
+def empty_corpus():
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM recipeingredient")
+        conn.exec_driver_sql("DELETE FROM recipe")
+
+def _stored():
+    with engine.connect() as conn:
+        return dict(conn.exec_driver_sql("SELECT title, kcal FROM recipe").fetchall())
+
+@pytest.fixture
+def pages(upstream):
+    upstream.pages.update({
+        "/zupa": _page("Zupa | Blog", ["2 ziemniaki", "1 cebula", "marchew"], name="Zupa ziemniaczana", calories="180 kcal"),
+        "/placki": _page("Placki ziemniaczane", ["ziemniaki", "jajko", "mąka"]),
+        "/nalesniki": _page("Naleśniki", ["mleko", "jajko", "mąka"], name="Naleśniki"),
+        "/artykul": _page("Ziemniaki i cebula — porady", body="ziemniaki cebula 300 kcal"),
+        "/bez-skladnikow": _page("Pusta", [], name="Pusta"),
+        # Ingredient lines with no word of three or more letters give no index tokens.
+        "/same-liczby": _page("Liczby", ["2 x 100 g", "1 ł"], name="Liczby"),
+    })
+    return upstream
+
+def test_every_recipe_page_is_stored_before_the_ingredient_filter(pages):
+    found = recipes.find_recipes(["ziemniaki", "cebula"], max_results=5)
+    assert sorted(d["url"].rsplit("/", 1)[1] for d in found) == ["artykul", "zupa"]
+    # Pages without the searched ingredients are kept; pages without a recipe structure aren't.
+    assert _stored() == {"Zupa ziemniaczana": 180, "Placki ziemniaczane": None, "Naleśniki": None}
+
+def test_stored_recipes_answer_later_searches_offline(pages):
+    recipes.find_recipes(["ziemniaki", "cebula"], max_results=5)
+    pages.close()
+    assert [d["title"] for d in recipes.find_recipes(["jajko", "mąka"], max_results=2)] in (
+        ["Placki ziemniaczane", "Naleśniki"], ["Naleśniki", "Placki ziemniaczane"],
+    )
+
+def test_async_search_stores_recipes_too(pages):
+    async def run():
+        try:
+            await warm_up_async_engine()
+            return await recipes.afind_recipes(["ziemniaki", "cebula"], max_results=5)
+        finally:
+            await close_async_http()
+            await async_engine.dispose()
+
+    assert sorted(d["url"].rsplit("/", 1)[1] for d in asyncio.run(run())) == ["artykul", "zupa"]
+    assert set(_stored()) == {"Zupa ziemniaczana", "Placki ziemniaczane", "Naleśniki"}
+
+def test_recipe_without_indexable_ingredients_is_skipped():
+    recipes.save_recipe("https://example.org/liczby", "Liczby", None, "2 x 100 g 1 ł")
+    assert _stored() == {}
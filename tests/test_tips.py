@@ -0,0 +1,56 @@
+import sys
+import types
+import pytest
+from sqlmodel import Session, select
+from app.core.db import engine
+from app.models import Tip, Translation
+from app.services import tips
+
+TIP = "Eat plenty of vegetables and fruit every day, because fiber keeps you full and supports a healthy diet."
+
+class _Translator:
+    fail = False
+
+    def __init__(self, source, target):
+        pass
+
+    def translate(self, text):
+        if _Translator.fail:
+            raise ConnectionError("offline")
+        return "PL: " + text
+
+@pytest.fixture(autouse=True)
+def offline_sources(monkeypatch):
+    monkeypatch.setattr(tips, "harvest_tips", lambda: [(TIP, "https://example.org/diet")])
+    monkeypatch.setitem(sys.modules, "deep_translator", types.SimpleNamespace(GoogleTranslator=_Translator))
+    _Translator.fail = False
+    with Session(engine) as session:
+        session.connection().exec_driver_sql("DELETE FROM tip")
+        session.connection().exec_driver_sql("DELETE FROM translation")
+        session.commit()
+
+def _pool():
+    with Session(engine) as session:
+        return session.exec(select(Tip.text, Tip.text_pl)).all()
+
+def test_translated_tips_are_stored():
+    assert tips.refresh_tip_pool() == 1
+    assert _pool() == [(TIP, "PL: " + TIP)]
+
+def test_failed_translation_is_retried_on_the_next_harvest():
+    _Translator.fail = True
+    assert tips.refresh_tip_pool() == 0
+    assert _pool() == []
+    with Session(engine) as session:
+        assert session.exec(select(Translation)).all() == []
+
+    _Translator.fail = False
+    assert tips.refresh_tip_pool() == 1
+    assert _pool() == [(TIP, "PL: " + TIP)]
+
+def test_untranslated_tips_from_older_versions_are_replaced():
+    with Session(engine) as session:
+        session.add(Tip(text=TIP, text_pl=TIP, source="https://example.org/diet"))
+        session.commit()
+    assert tips.refresh_tip_pool() == 1
+    assert _pool() == [(TIP, "PL: " + TIP)]